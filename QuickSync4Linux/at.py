@@ -8,6 +8,8 @@ class Delay:
     TimeoutRead    : int = 2.000
     TimeoutWrite   : int = 2.000
     ObexBoundary   : int = 1.000
+    RetryBackoff   : int = 0.500 # doubled with every retry
+    RetryBackoffMax: int = 8.000
 
 # AT commands recognized by the Gigaset devices
 class Command:
@@ -83,11 +85,44 @@ def evaluateResponse(buf, request):
     elif(request.decode('ascii').startswith(Command.Dial.format('').strip()) and b'OK\r\n' in buf):
         return True
 
+    elif(b'\nERROR\r\n' in buf or buf.startswith(b'ERROR\r\n')):
+        # also an error of one of multiple commands sent at once
+        raise AtException('Device reported an AT command error')
+
     elif(buf.endswith(b'OK\r\n')):
         return removeSuffix(removePrefix(buf, request.strip()), b'OK\r\n').strip()
 
-    elif(buf.endswith(b'ERROR\r\n')):
-        raise AtException('Device reported an AT command error')
-
     else:
         raise IncompleteAtResponseException()
+
+class AtFramer:
+    # collects received bytes until the final result line (OK/ERROR) of the request arrived;
+    # every byte is only scanned once for line endings. A request may contain multiple commands
+    # (one per line), then the response is complete with the result of the last one or the first error.
+    def __init__(self, request):
+        self.request = request
+        self.buf = bytearray()
+        self.scanned = 0
+        self.results = 0
+        self.expected = max(1, sum(1 for line in request.split(b'\n') if line.startswith(b'AT')))
+
+    def feed(self, data):
+        self.buf += data
+
+    def response(self):
+        if(self.request.decode('ascii') == Command.ExitObex):
+            # the ExitObex command does not return any text
+            return b''
+        while True:
+            end = self.buf.find(b'\n', self.scanned)
+            if(end < 0): return None
+            line = self.buf[self.scanned:end].strip()
+            self.scanned = end + 1
+            if(line == b'OK' or line == b'ERROR'):
+                self.results += 1
+                if(line == b'OK' and self.results < self.expected): continue
+                self.results = 0
+                response = bytes(self.buf[:self.scanned])
+                del self.buf[:self.scanned]
+                self.scanned = 0
+                return response
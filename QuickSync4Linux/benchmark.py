@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+
+# Benchmarks against the simulator which fail (exit code 1) when a budget is exceeded.
+#
+#   startup: runs actions in a fresh interpreter with `-X importtime` and checks how long
+#            loading modules takes and that no module is loaded which the action does not need.
+#   imageupload: uploads pictures of several sizes once in AT mode (AT^DMPU/AT^DMPW) and once
+#            with Obex (including entering and leaving Obex mode) and compares latency and throughput.
+
+import subprocess
+import argparse
+import statistics
+import tempfile
+import shutil
+import io
+import random
+import time
+import sys
+import os
+
+from .__init__ import __version__
+from . import simulator
+from . import client
+from . import obex
+
+
+# import time budget (milliseconds, on top of the bare interpreter start) and modules which
+# must not be loaded by an action
+startupBudgets = {
+    'dial': {
+        'options': '0123456789',
+        'budget': 40,
+        'forbidden': [
+            'asyncio', 'datetime', 'pathlib', 'xml.dom.minidom', 'shlex',
+            'QuickSync4Linux.cache', 'QuickSync4Linux.vcard',
+        ],
+    },
+    'info': {
+        'options': None,
+        'budget': 40,
+        'forbidden': ['asyncio', 'datetime', 'pathlib', 'xml.dom.minidom'],
+    },
+    'listfiles': {
+        'options': 'refresh',
+        'budget': 60,
+        'forbidden': ['asyncio', 'pathlib', 'QuickSync4Linux.vcard'],
+    },
+}
+
+def parseImportTime(stderr):
+    # returns {module: cumulative microseconds} and the total of all top level imports
+    modules = {}
+    total = 0
+    for line in stderr.splitlines():
+        if(not line.startswith('import time:') or 'cumulative' in line): continue
+        selfTime, cumulative, name = line[len('import time:'):].split('|')
+        modules[name.strip()] = int(cumulative)
+        if(not name.startswith('  ')): total += int(cumulative)
+    return modules, total
+
+def measureImports(args, cacheDir):
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+    env['XDG_CACHE_HOME'] = cacheDir # do not touch the real device cache
+    start = time.monotonic()
+    process = subprocess.run(
+        [sys.executable, '-X', 'importtime'] + args,
+        stdin=subprocess.DEVNULL, capture_output=True, text=True, env=env
+    )
+    duration = time.monotonic() - start
+    modules, total = parseImportTime(process.stderr)
+    return process.returncode, modules, total, duration
+
+def startup(args):
+    # the interpreter itself loads some modules (site, encodings, ...) which we can not influence
+    cacheDir = tempfile.mkdtemp()
+    baseline = statistics.median(measureImports(['-c', 'pass'], cacheDir)[2] for i in range(args.repeat))
+
+    failed = []
+    with simulator.Simulator() as sim:
+        for action, spec in startupBudgets.items():
+            if(args.actions and action not in args.actions): continue
+            command = ['-m', 'QuickSync4Linux', action]
+            if(spec['options']): command.append(spec['options'])
+            command += ['--device', sim.port, '--no-daemon']
+
+            measureImports(command, cacheDir) # warm up the file system cache and write bytecode
+            runs = [measureImports(command, cacheDir) for i in range(args.repeat)]
+            if(any(run[0] != 0 for run in runs)):
+                failed.append(action)
+                print('{0}: FAILED (exit code {1})'.format(action, runs[0][0]))
+                continue
+
+            importTime = statistics.median(run[2] for run in runs)/1000 - baseline/1000
+            wallTime = statistics.median(run[3] for run in runs)*1000
+            budget = spec['budget'] * args.budget_scale
+            loaded = [name for name in spec['forbidden'] if name in runs[0][1]]
+            ok = importTime <= budget and not loaded
+            if(not ok): failed.append(action)
+            print('{0}: {1} imports {2:.1f} ms (budget {3:.0f} ms), process {4:.0f} ms'.format(
+                action, 'OK' if ok else 'FAILED', importTime, budget, wallTime
+            ))
+            if(loaded):
+                print('    must not load:', ', '.join(loaded))
+            if(args.verbose or not ok):
+                modules = sorted(runs[0][1].items(), key=lambda item: item[1], reverse=True)
+                for name, cumulative in modules[:args.verbose*10 or 10]:
+                    print('    {0:8.1f} ms  {1}'.format(cumulative/1000, name))
+    shutil.rmtree(cacheDir, ignore_errors=True)
+    return failed
+
+
+def uploadImage(quickSyncClient, path, data, mode):
+    # seconds until the picture is stored on the device, from AT command mode back to AT command mode
+    start = time.monotonic()
+    if(mode == 'at'):
+        quickSyncClient.putImage(path, data)
+    else:
+        quickSyncClient.enterObex()
+        quickSyncClient.putFile(path, io.BytesIO(data), len(data))
+        quickSyncClient.exitObex()
+    return time.monotonic() - start
+
+def imageUpload(args):
+    failed = []
+    sim = simulator.Simulator(
+        baud=args.baud, responseDelay=args.response_delay, switchTime=args.switch_time,
+        memoryTotal=64*1024*1024, seed=1
+    )
+    with sim:
+        quickSyncClient = client.QuickSyncClient(sim.port, args.baud or 9600).open()
+        print('{0:>8}  {1:>10}  {2:>10}  {3:>12}  {4:>12}'.format('size', 'AT ms', 'Obex ms', 'AT KiB/s', 'Obex KiB/s'))
+        for size in args.sizes:
+            data = bytes(random.Random(size).getrandbits(8) for i in range(size*1024))
+            durations = {}
+            for mode in ['at', 'obex']:
+                runs = []
+                for counter in range(args.repeat):
+                    name = 'bench-{0}-{1}-{2}.jpg'.format(size, mode, counter)
+                    try:
+                        runs.append(uploadImage(quickSyncClient, obex.FolderPath.ClipPictures+'/'+name, data, mode))
+                    except Exception as e:
+                        print('{0} KiB {1}: FAILED ({2})'.format(size, mode, e))
+                        break
+                    stored = sim.files[obex.FolderPath.ClipPictures].pop(name, None)
+                    if(stored is None or stored.data != data):
+                        print('{0} KiB {1}: FAILED (stored picture differs)'.format(size, mode))
+                        break
+                if(len(runs) < args.repeat):
+                    failed.append('{0}K-{1}'.format(size, mode))
+                    continue
+                durations[mode] = statistics.median(runs)
+            print('{0:>6} K  {1:>10}  {2:>10}  {3:>12}  {4:>12}'.format(size, *(
+                ['{0:.0f}'.format(durations[mode]*1000) if(mode in durations) else '-' for mode in ['at', 'obex']]
+                + ['{0:.1f}'.format(size/durations[mode]) if(mode in durations) else '-' for mode in ['at', 'obex']]
+            )))
+        quickSyncClient.close()
+    return failed
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog='QuickSync4Linux.benchmark',
+        description='QuickSync4Linux benchmarks with budgets, using the device simulator',
+        epilog=f'Version {__version__}'
+    )
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+    parserStartup = subparsers.add_parser('startup', help='cold start import time per action')
+    parserStartup.add_argument('actions', nargs='*', help='actions to measure, default all: '+', '.join(startupBudgets))
+    parserStartup.add_argument('-r', '--repeat', type=int, default=5, help='runs per action, the median is compared')
+    parserStartup.add_argument('--budget-scale', type=float, default=1.0, help='multiply all budgets, e.g. for slow machines')
+    parserStartup.add_argument('-v', '--verbose', action='count', default=0, help='list the slowest imports')
+    parserImage = subparsers.add_parser('imageupload', help='picture upload in AT mode compared to Obex')
+    parserImage.add_argument('sizes', nargs='*', type=int, default=[2, 8, 32, 128], help='picture sizes in KiB, default: 2 8 32 128')
+    parserImage.add_argument('-r', '--repeat', type=int, default=3, help='uploads per size and mode, the median is compared')
+    parserImage.add_argument('--baud', type=int, default=115200, help='emulated line speed, 0 for unlimited')
+    parserImage.add_argument('--response-delay', type=float, default=0.005, help='seconds until the device answers')
+    parserImage.add_argument('--switch-time', type=float, default=0.0, help='seconds in which the device ignores input after a mode switch')
+    args = parser.parse_args()
+
+    if(args.benchmark == 'startup'):
+        failed = startup(args)
+    elif(args.benchmark == 'imageupload'):
+        failed = imageUpload(args)
+
+    if(failed):
+        print('Budget exceeded:', ' '.join(failed))
+        exit(1)
+
+if __name__ == '__main__':
+    main()
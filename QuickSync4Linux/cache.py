@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import re
+
+# local per-device data (contact cache etc.), kept in ~/.cache/quicksync4linux/<device serial>/
+
+def baseDir():
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~')+'/.cache'
+    return os.path.join(base, 'quicksync4linux')
+
+def cacheDir(identity):
+    path = os.path.join(baseDir(), re.sub(r'[^\w.-]', '_', identity))
+    os.makedirs(path, exist_ok=True)
+    return path
+
+def identities(name):
+    # all devices which have the given cache file
+    try:
+        entries = sorted(os.scandir(baseDir()), key=lambda entry: entry.name)
+    except FileNotFoundError:
+        return []
+    return [entry.name for entry in entries if os.path.isfile(os.path.join(entry.path, name))]
+
+def load(identity, name, default=None):
+    try:
+        with open(os.path.join(cacheDir(identity), name), 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+def save(identity, name, data):
+    # write into a temp file first so that an interrupted run never leaves a broken cache
+    path = os.path.join(cacheDir(identity), name)
+    tmpPath = path+'.tmp'
+    with open(tmpPath, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmpPath, path)
+
+def remove(identity, name):
+    try:
+        os.remove(os.path.join(cacheDir(identity), name))
+    except FileNotFoundError:
+        pass
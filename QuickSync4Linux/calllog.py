@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+
+# Local SQLite store for the call logs of the devices (telecom/ich.log, och.log, mch.log).
+# Every pull inserts only entries which are not stored yet, one store can hold the calls of many devices:
+#   python3 -m QuickSync4Linux.calllog query --kind missed --since 2024-03-01 --output missed.csv
+#   python3 -m QuickSync4Linux.calllog import new-calls.json
+
+import argparse
+import sqlite3
+import json
+import csv
+import sys
+import os
+import re
+
+from .__init__ import __version__
+from . import obex
+from . import vcard as vcardlib
+
+
+# call log kind and its path on the device
+kinds = {
+    'incoming': obex.FilePath.IncomingCalls,
+    'outgoing': obex.FilePath.OutgoingCalls,
+    'missed': obex.FilePath.MissedCalls,
+}
+
+columns = ['device', 'kind', 'time', 'number', 'name']
+
+def defaultStorePath():
+    base = os.environ.get('XDG_DATA_HOME') or os.path.expanduser('~')+'/.local/share'
+    return os.path.join(base, 'quicksync4linux', 'calllog.sqlite')
+
+def parseDateTime(value):
+    # 20240312T101500(Z) -> 2024-03-12T10:15:00, sortable as text
+    match = re.fullmatch(r'(\d{4})(\d{2})(\d{2})T(\d{2})(\d{2})(\d{2})Z?', value.strip())
+    if(not match): return None
+    return '{0}-{1}-{2}T{3}:{4}:{5}'.format(*match.groups())
+
+def parseCallLog(text, kind):
+    # the call log is a list of vCards, the call time is in X-IRMC-CALL-DATETIME
+    entries = []
+    for vcard in vcardlib.splitVcards(text):
+        properties = vcardlib.getProperties(vcard)
+        entry = {'kind': kind, 'time': None, 'number': '', 'name': vcardlib.getName(properties)}
+        for name, params, value in properties:
+            if(name == 'TEL' and not entry['number']):
+                entry['number'] = value
+            elif(name == 'X-IRMC-CALL-DATETIME'):
+                entry['time'] = parseDateTime(value)
+        if(entry['time']): entries.append(entry)
+    return entries
+
+
+class CallLogStore:
+    def __init__(self, path=None):
+        self.path = path or defaultStorePath()
+        if(os.path.dirname(self.path)): os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        # fleet runs write from many processes into the same store
+        self.db = sqlite3.connect(self.path, timeout=30)
+        self.db.row_factory = sqlite3.Row
+        with self.db:
+            self.db.execute(
+                'CREATE TABLE IF NOT EXISTS calls ('
+                'device TEXT NOT NULL, kind TEXT NOT NULL, time TEXT NOT NULL, number TEXT NOT NULL, name TEXT, '
+                'UNIQUE(device, kind, time, number))'
+            )
+            self.db.execute('CREATE INDEX IF NOT EXISTS calls_number ON calls (number, time)')
+            self.db.execute('CREATE INDEX IF NOT EXISTS calls_time ON calls (time)')
+
+    def add(self, device, entries):
+        # returns the entries which were not stored yet
+        added = []
+        with self.db:
+            for entry in entries:
+                cursor = self.db.execute(
+                    'INSERT OR IGNORE INTO calls (device, kind, time, number, name) VALUES (?, ?, ?, ?, ?)',
+                    (device, entry['kind'], entry['time'], entry['number'], entry.get('name') or '')
+                )
+                if(cursor.rowcount): added.append(dict(entry, device=device))
+        return added
+
+    def query(self, kinds=None, number=None, device=None, since=None, until=None, limit=None):
+        # since/until: ISO date or date and time, compared as text
+        conditions = []
+        params = []
+        if(kinds):
+            conditions.append('kind IN ({0})'.format(','.join('?' for kind in kinds)))
+            params += kinds
+        if(number):
+            conditions.append('number = ?')
+            params.append(number)
+        if(device):
+            conditions.append('device = ?')
+            params.append(device)
+        if(since):
+            conditions.append('time >= ?')
+            params.append(since)
+        if(until):
+            conditions.append('time < ?')
+            params.append(until)
+        sql = 'SELECT {0} FROM calls'.format(', '.join(columns))
+        if(conditions): sql += ' WHERE '+' AND '.join(conditions)
+        sql += ' ORDER BY time DESC'
+        if(limit):
+            sql += ' LIMIT ?'
+            params.append(limit)
+        return [dict(row) for row in self.db.execute(sql, params)]
+
+    def close(self):
+        self.db.close()
+
+
+def writeCsv(entries, f):
+    writer = csv.DictWriter(f, fieldnames=columns, extrasaction='ignore')
+    writer.writeheader()
+    writer.writerows(entries)
+
+def writeJson(entries, f):
+    json.dump([{column: entry.get(column) for column in columns} for entry in entries], f, indent=2)
+    f.write('\n')
+
+def writeEntries(entries, path):
+    # JSON if the file name ends with .json, CSV otherwise; '-' for stdout
+    write = writeJson if(path.endswith('.json')) else writeCsv
+    if(path == '-' or path == ''):
+        write(entries, sys.stdout)
+    else:
+        with open(path, 'w', newline='') as f:
+            write(entries, f)
+
+def readEntries(path):
+    # entries exported with writeEntries, e.g. the new calls of a pull on another machine
+    with (sys.stdin if(path == '-') else open(path, 'r', newline='')) as f:
+        if(path.endswith('.json')): return json.load(f)
+        return list(csv.DictReader(f))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog='QuickSync4Linux.calllog',
+        description='Query the local call log store filled by the "calllog" action',
+        epilog=f'Version {__version__}'
+    )
+    parser.add_argument('--store', default=defaultStorePath(), help='SQLite file, default: '+defaultStorePath())
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    parserQuery = subparsers.add_parser('query', help='print stored calls, newest first')
+    parserQuery.add_argument('-k', '--kind', action='append', choices=list(kinds), help='only calls of this kind, can be given multiple times')
+    parserQuery.add_argument('-n', '--number', help='only calls with this phone number')
+    parserQuery.add_argument('-d', '--device', help='only calls of this device serial')
+    parserQuery.add_argument('--since', help='only calls at or after this time, e.g. 2024-03-01 or 2024-03-01T08:00')
+    parserQuery.add_argument('--until', help='only calls before this time')
+    parserQuery.add_argument('--limit', type=int, help='max number of calls')
+    parserQuery.add_argument('-o', '--output', default='-', help='output file, JSON if it ends with .json, otherwise CSV')
+    parserImport = subparsers.add_parser('import', help='add calls exported by the "calllog" action of another machine')
+    parserImport.add_argument('files', nargs='+', help='.json or .csv files, "-" for CSV from stdin')
+    args = parser.parse_args()
+
+    store = CallLogStore(args.store)
+    if(args.command == 'query'):
+        writeEntries(store.query(args.kind, args.number, args.device, args.since, args.until, args.limit), args.output)
+    elif(args.command == 'import'):
+        for path in args.files:
+            entries = readEntries(path)
+            added = 0
+            for device in sorted(set(entry['device'] for entry in entries)):
+                added += len(store.add(device, [entry for entry in entries if entry['device'] == device]))
+            print('{0}: {1} calls, {2} new'.format(path, len(entries), added), file=sys.stderr)
+    store.close()
+
+if __name__ == '__main__':
+    main()
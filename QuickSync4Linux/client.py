@@ -0,0 +1,767 @@
+#!/usr/bin/env python3
+
+# Importable client API. Every operation is written once as a generator ("steps") which
+# yields requests and receives their responses; QuickSyncClient executes these steps with
+# blocking serial IO, AsyncQuickSyncClient with asyncio on the non-blocking serial port.
+#
+#   with QuickSyncClient('/dev/ttyACM0') as client:
+#       with client.obexSession():
+#           vcf = client.getContacts()
+
+from contextlib import contextmanager, asynccontextmanager
+import struct
+import time
+import os
+
+from . import at
+from . import obex
+from . import transport
+from . import transfer
+
+
+class Request:
+    __slots__ = ['data', 'wait', 'isObex', 'sink', 'progress', 'flush', 'headers', 'noResponse']
+
+    # data=None means: just wait `wait` seconds (and discard all received bytes if `flush` is set)
+    # headers: dict which receives the headers of the Obex response (e.g. to see if Single Response Mode was accepted)
+    # noResponse: Obex packet which the device does not answer in Single Response Mode
+    def __init__(self, data=None, wait=None, isObex=False, sink=None, progress=None, flush=False, headers=None, noResponse=False):
+        self.data = data
+        self.wait = wait
+        self.isObex = isObex
+        self.sink = sink
+        self.progress = progress
+        self.flush = flush
+        self.headers = headers
+        self.noResponse = noResponse
+
+class CountingSink:
+    # remembers how much was written into a sink, so that a failed download can be started over
+    def __init__(self, sink, progress=None):
+        self.sink = sink
+        self.progress = progress
+        self.start = sink.tell() if(getattr(sink, 'seekable', None) and sink.seekable()) else None
+        self.written = 0
+
+    def write(self, data):
+        self.written += len(data)
+        return self.sink.write(data)
+
+    def rewind(self):
+        if(self.written):
+            if(self.start is None): return False # e.g. stdout
+            self.sink.seek(self.start)
+            self.sink.truncate()
+            if(self.progress): self.progress.update(-self.written)
+        self.written = 0
+        return True
+
+class TeeSink:
+    # writes the received data into the output and into followers which process it on the fly,
+    # e.g. a parser; rewinding the output for a repeated download resets the followers
+    def __init__(self, output, *followers):
+        self.output = output
+        self.followers = followers
+
+    def write(self, data):
+        for follower in self.followers: follower.write(data)
+        return self.output.write(data)
+
+    def seekable(self):
+        return bool(getattr(self.output, 'seekable', None) and self.output.seekable())
+
+    def tell(self):
+        return self.output.tell()
+
+    def seek(self, position):
+        for follower in self.followers: follower.reset()
+        return self.output.seek(position)
+
+    def truncate(self):
+        return self.output.truncate()
+
+class ResponseReader:
+    # collects the response of one request from the received bytes, independent of how they are read
+    def __init__(self, client, request):
+        self.client = client
+        self.request = request
+        self.framer = obex.ObexFramer() if(request.isObex) else at.AtFramer(request.data)
+        self.results = []
+        self.headers = {} if(request.headers is None) else request.headers
+        self.response = None
+        # statistics for timing.TimingRecorder
+        self.firstByte = None
+        self.bytesOut = len(request.data)
+        self.bytesIn = 0
+        self.reads = 0
+        # round trip of the current Obex packet for the transfer controller
+        self.packetSent = time.monotonic()
+        self.packetBytesOut = 0
+        # continuation requests, written by the client in its own (blocking or non-blocking) way
+        self.outgoing = b''
+
+    def feed(self, data):
+        if(self.firstByte is None): self.firstByte = time.monotonic()
+        self.bytesIn += len(data)
+        self.reads += 1
+        self.framer.feed(data)
+        if(self.client.verbose):
+            if(self.client.verbose >= 2): print(data.hex())
+            print(data.decode('ascii', errors='backslashreplace'), end='')
+
+    def poll(self):
+        # returns True as soon as the response is complete, the result is in `self.response`
+        if(not self.request.isObex):
+            response = self.framer.response()
+            if(response is None): return False
+            self.response = at.evaluateResponse(response, self.request.data)
+            return True
+
+        while True:
+            packet = self.framer.packet()
+            if(packet is None): return False
+            self.headers.pop(obex.Header.SingleResponseParams, None) # only valid for one packet
+            finished = obex.evaluateResponse(packet, self.results, None, self.request.isObex, self.headers)
+            if(self.client.transfer):
+                now = time.monotonic()
+                self.client.transfer.success(self.bytesOut - self.packetBytesOut + len(packet), now - self.packetSent)
+                self.packetSent, self.packetBytesOut = now, self.bytesOut
+            if(not finished and not obex.srmStreaming(self.headers)):
+                # ask for the next packet, in Single Response Mode the device sends it without
+                self.outgoing += obex.compileMessage(obex.OpCode.Get+obex.Mask.Final)
+                self.bytesOut += 3
+            if(self.request.sink is not None):
+                # hand over body chunks immediately instead of collecting the whole object
+                for chunk in self.results:
+                    self.request.sink.write(chunk)
+                    if(self.request.progress): self.request.progress.update(len(chunk), self.headers.get(obex.Header.Length))
+                self.results.clear()
+            if(finished):
+                if(self.client.verbose and self.headers):
+                    print('\nHeaders:', {hex(k): bytes(v) if isinstance(v, memoryview) else v for k, v in self.headers.items()})
+                self.response = b''.join(self.results)
+                return True
+
+    def takeOutgoing(self):
+        data, self.outgoing = self.outgoing, b''
+        return data
+
+
+class BaseQuickSyncClient:
+    def __init__(self, device='/dev/ttyACM0', baud=9600, verbose=0, ser=None):
+        self.device = device
+        self.baud = baud
+        self.verbose = verbose
+        self.ser = ser
+        # per client copy of the delays, may be tuned by a device profile
+        self.delay = at.Delay()
+        self.maxPacketSize = obex.Connection.DefaultPacketSize
+        self.serial = device
+        self.inObex = False
+        # timing.TimingRecorder which gets every executed request, if set
+        self.timing = None
+        # how often a busy packet or a failed Obex operation is sent again
+        self.retries = 3
+        self.profileLoaded = False
+        # AT^SACO? answer for normalising phone numbers, queried before the phonebook is downloaded
+        self.areaCodes = None
+        # offer Obex Single Response Mode; srm is None until the device accepted (True) or declined (False) it
+        self.singleResponseMode = True
+        self.srm = None
+        # transfer.TransferController of the Obex session, adapts the packet size to the link;
+        # `transferListener` is called with the controller after every packet, e.g. for live stats
+        self.adaptiveTransfer = True
+        self.transfer = None
+        self.transferListener = None
+
+    def open(self):
+        if(self.ser is None):
+            import serial
+            self.ser = serial.Serial(self.device, self.baud, write_timeout=self.delay.TimeoutWrite)
+        if(self.verbose): print('Connected to:', self.ser.name)
+        return self
+
+    def close(self):
+        if(self.ser is not None):
+            self.ser.close()
+            self.ser = None
+
+    def send(self, request):
+        self.printSend(request)
+        self.ser.write(request.data)
+        return self.startResponse(request)
+
+    def printSend(self, request):
+        if(self.verbose):
+            print()
+            print('=== SEND ===')
+            if(self.verbose >= 2): print(request.data.hex())
+            print(request.data.decode('ascii', errors='backslashreplace'))
+
+    def startResponse(self, request):
+        if(self.verbose):
+            print()
+            print('=== RECEIVE ===')
+        return ResponseReader(self, request)
+
+    def timeoutException(self):
+        return transport.ReadTimeoutException('Device did not respond within {0} seconds'.format(self.delay.TimeoutRead))
+
+    # --- retries
+
+    def isTransientError(self, e):
+        if(isinstance(e, obex.ObexException)): return e.code in obex.BusyReCodes
+        return isinstance(e, (transport.ReadTimeoutException, obex.InvalidObexLengthException))
+
+    def transferFailed(self, e):
+        if(self.transfer and self.isTransientError(e)): self.transfer.failure(shrink=not isinstance(e, obex.ObexException))
+
+    def packetSize(self):
+        # Put packet size: adapted to the link, at most the negotiated size
+        return self.transfer.packetSize if(self.transfer) else self.maxPacketSize
+
+    def pacingSteps(self):
+        # pause before the next packet while the link is lossy
+        if(self.transfer and self.transfer.pause): yield Request(wait=self.transfer.pause)
+
+    def retryDelay(self, attempt):
+        return min(self.delay.RetryBackoff * 2**attempt, self.delay.RetryBackoffMax)
+
+    def packetSteps(self, request):
+        # send a packet again if the device rejected it because it was busy
+        attempt = 0
+        while True:
+            try:
+                response = yield request
+                return response
+            except obex.ObexException as e:
+                if(e.code not in obex.BusyReCodes or attempt >= self.retries): raise
+            yield Request(wait=self.retryDelay(attempt))
+            attempt += 1
+
+    def abortSteps(self):
+        # end a failed Put/Get on the device; late answers to the failed request are discarded first
+        yield Request(wait=self.delay.ObexBoundary, flush=True)
+        try:
+            yield Request(obex.compileMessage(obex.OpCode.Abort), isObex=True)
+        except (obex.ObexException, obex.InvalidObexLengthException, transport.ReadTimeoutException):
+            pass # nothing to abort or the device is gone, the retry will tell
+
+    def operationSteps(self, attemptSteps, rewind=None):
+        # start an Obex operation over after transient errors; `attemptSteps` creates the steps of
+        # one attempt, `rewind` resets source/sink and returns False if this is not possible
+        attempt = 0
+        while True:
+            try:
+                response = yield from attemptSteps()
+                return response
+            except Exception as e:
+                self.transferFailed(e)
+                if(not self.isTransientError(e) or attempt >= self.retries): raise
+                if(rewind and not rewind()): raise
+                if(self.verbose): print('\nRetrying after error:', e)
+            yield from self.abortSteps()
+            yield Request(wait=self.retryDelay(attempt))
+            attempt += 1
+
+    # --- Single Response Mode
+
+    def srmHeader(self):
+        # offered with every Get/Put until the device declined it in this Obex session
+        if(not self.singleResponseMode or self.srm is False): return b''
+        return obex.compileSrmHeader()
+
+    def srmFirstSteps(self, makeRequest, retryBusy=False):
+        # first packet of a Get/Put, `makeRequest(srmHeader, headers)` creates it; a device which does
+        # not know the header gets the packet again without it. Returns the response and its headers.
+        def send(srmHeader, headers):
+            request = makeRequest(srmHeader, headers)
+            if(retryBusy): return (yield from self.packetSteps(request))
+            return (yield request)
+        srmHeader = self.srmHeader()
+        headers = {}
+        try:
+            response = yield from send(srmHeader, headers)
+        except obex.ObexException as e:
+            if(not srmHeader or e.code not in obex.SrmRejectReCodes): raise
+            if(self.verbose): print('\nSingle Response Mode rejected:', e)
+            self.srm = False
+            headers = {}
+            response = yield from send(b'', headers)
+            return response, headers
+        if(srmHeader):
+            self.srm = (headers.get(obex.Header.SingleResponseMode) == obex.SingleResponseMode.Enable)
+            if(self.verbose): print('\nSingle Response Mode', 'accepted' if self.srm else 'declined')
+        return response, headers
+
+    def srmRecoverySteps(self, abort):
+        # after an error while streaming Put packets, more packets may still be on their way and the
+        # device answers every failed one with an error. The last packet (or an Abort if the last
+        # packet was not sent yet) is answered with success: read all answers up to it, so that none
+        # of them is taken for the answer of a later request
+        if(abort): request = Request(obex.compileMessage(obex.OpCode.Abort), isObex=True)
+        else: request = Request(b'', isObex=obex.QuickSyncOperation.Upload)
+        while True:
+            try:
+                yield request
+                return
+            except obex.ObexException:
+                request = Request(b'', isObex=obex.QuickSyncOperation.Upload) # answer of another packet, read the next one
+            except (transport.ReadTimeoutException, obex.InvalidObexLengthException):
+                return # nothing pending anymore
+
+    # --- operations as steps
+
+    def commandSteps(self, command, *args, wait=None):
+        response = yield Request(at.formatCommand(command, *args), wait=wait)
+        return response
+
+    def dialSteps(self, number):
+        yield Request(at.formatCommand(at.Command.Dial, number))
+
+    def querySerialSteps(self):
+        response = yield from self.commandSteps(at.Command.GetSerialNumber)
+        self.serial = response.decode('ascii')
+        return self.serial
+
+    def queryDeviceModelSteps(self):
+        deviceType = yield from self.commandSteps(at.Command.GetDeviceType)
+        productName = yield from self.commandSteps(at.Command.GetProductName)
+        return 'model {0}/{1}'.format(deviceType.decode('ascii'), productName.decode('ascii'))
+
+    def enterObexSteps(self):
+        yield Request(at.formatCommand(at.Command.EnterObex), wait=self.delay.AfterEnterObex)
+        connectResponse = yield Request(
+            obex.compileConnect(obex.compileMessage(obex.Header.Target, obex.ServiceUuid.DesSync)),
+            isObex=obex.QuickSyncOperation.Connect
+        )
+        self.inObex = True
+        self.srm = None
+        # the packet size is limited by the smaller of both sides
+        self.maxPacketSize = min(
+            struct.unpack('>H', obex.Connection.MaxPacketSize)[0],
+            obex.parseConnectResponse(connectResponse)
+        )
+        if(self.verbose): print('\nNegotiated Obex packet size:', self.maxPacketSize)
+        if(not self.adaptiveTransfer):
+            self.transfer = None
+        elif(self.transfer is None):
+            self.transfer = transfer.TransferController(self.maxPacketSize, listener=self.transferListener)
+        else:
+            self.transfer.setMaxPacketSize(self.maxPacketSize)
+
+    def exitObexSteps(self):
+        yield Request(wait=self.delay.ObexBoundary)
+        yield Request(at.formatCommand(at.Command.ExitObex), wait=self.delay.ObexBoundary)
+        self.inObex = False
+        yield Request(wait=self.delay.AfterExitObex)
+        yield Request(at.formatCommand(at.Command.Reset))
+
+    def getObjectSteps(self, path, sink=None, progress=None):
+        if(sink is not None): sink = CountingSink(sink, progress)
+        def attemptSteps():
+            response, headers = yield from self.srmFirstSteps(lambda srmHeader, headers: Request(
+                obex.compileMessage(
+                    obex.OpCode.Get+obex.Mask.Final,
+                    obex.compileNameHeader( path ) + srmHeader
+                ),
+                isObex=True, sink=sink, progress=progress, headers=headers
+            ))
+            return response
+        response = yield from self.operationSteps(attemptSteps, sink.rewind if(sink) else None)
+        return response
+
+    def putObjectSteps(self, path, data=None):
+        # a single packet PUT, without data this deletes the object
+        payload = obex.compileNameHeader( path )
+        if(data is not None):
+            payload += obex.compileLengthHeader( len(data) ) + obex.compileMessage( obex.Header.EndOfBody, data )
+        request = Request(obex.compileMessage(obex.OpCode.Put+obex.Mask.Final, payload), isObex=True)
+        yield from self.pacingSteps()
+        if(path in [obex.FilePath.NewVCardGQS, obex.FilePath.NewVCardGDS]):
+            # creating contacts is not idempotent: after a timeout the contact may exist already
+            try:
+                yield from self.packetSteps(request)
+            except Exception as e:
+                self.transferFailed(e)
+                raise
+        else:
+            yield from self.operationSteps(lambda: self.packetSteps(request))
+
+    def putFileSteps(self, path, f, total, progress=None):
+        buffer = bytearray(self.maxPacketSize)
+        start = f.tell() if(f.seekable()) else None
+        offset = 0
+        def rewind():
+            nonlocal offset
+            if(offset):
+                if(start is None): return False
+                f.seek(start)
+                if(progress): progress.update(-offset)
+            offset = 0
+            return True
+        def attemptSteps():
+            nonlocal offset
+            headers = {}
+            while True:
+                first = (offset == 0)
+                nameHeader = obex.compileNameHeader(path) if(first) else b''
+                lengthHeader = obex.compileLengthHeader(total) if(first) else b''
+                if(not first): yield from self.pacingSteps()
+                # fill the packet up to the current size: opcode+length, headers, body header; a small
+                # adapted size still leaves room for some body after the headers of the first packet
+                overhead = 3 + len(nameHeader) + len(lengthHeader) + len(self.srmHeader() if(first) else b'') + 3
+                chunkSize = max(self.packetSize(), min(self.maxPacketSize, overhead + obex.Connection.MinPacketSize)) - overhead
+                chunk = memoryview(buffer)[:f.readinto(memoryview(buffer)[:chunkSize])]
+                offset += len(chunk)
+                last = (offset >= total)
+                def makeRequest(srmHeader, headers):
+                    return Request(
+                        obex.compileMessage(
+                            obex.OpCode.Put+(obex.Mask.Final if last else 0),
+                            nameHeader
+                            + lengthHeader
+                            + srmHeader
+                            + obex.compileMessage( obex.Header.EndOfBody if last else obex.Header.Body, chunk )
+                        ),
+                        isObex=obex.QuickSyncOperation.Upload, headers=headers
+                    )
+                if(first):
+                    response, headers = yield from self.srmFirstSteps(makeRequest, retryBusy=True)
+                elif(obex.srmStreaming(headers)):
+                    # Single Response Mode: the next packet follows immediately, the device only answers
+                    # the last one. Any other answer is an error which may belong to an earlier packet,
+                    # so a single packet is never sent again: the upload is started over with
+                    # acknowledged packets, which can be repeated one by one if the device is busy
+                    request = makeRequest(b'', headers)
+                    lastSent = False
+                    try:
+                        if(last):
+                            # answers which are still pending, before they are taken for the answer of the last packet
+                            yield Request(b'', isObex=obex.QuickSyncOperation.Upload, noResponse=True)
+                            lastSent = True
+                        else:
+                            request.noResponse = True
+                        yield request
+                    except Exception:
+                        self.srm = False
+                        yield from self.srmRecoverySteps(abort=not lastSent)
+                        raise
+                else:
+                    yield from self.packetSteps(makeRequest(b'', headers))
+                if(progress): progress.update(len(chunk), total)
+                if(last): break
+        yield from self.operationSteps(attemptSteps, rewind)
+
+    def putImageSteps(self, path, data, progress=None, window=8):
+        # uploads a picture in AT mode (AT^DMPU/AT^DMPW) instead of Obex mode: `window` parts are
+        # sent at once without waiting for the answer of each part, the device tells at the end
+        # whether the whole picture arrived
+        inFlight = 0 # commands of the current batch which may still be answered
+        try:
+            answer = yield from self.commandSteps(at.Command.InitializeImageUpload)
+            partSize = int(answer.decode('ascii').split(':')[-1].strip(' ()').split('-')[-1]) # ^DMPU: (1-256)
+            parts = (len(data) + partSize - 1) // partSize
+            yield from self.commandSteps(at.Command.SendBasicImageInfo, '"'+path+'"', len(data), parts)
+            for first in range(0, parts, window):
+                commands = b''
+                for index in range(first, min(first + window, parts)):
+                    chunk = data[index*partSize:(index+1)*partSize]
+                    commands += at.formatCommand(at.Command.SendImagePart, index, index*partSize, len(chunk), chunk.hex().upper())
+                inFlight = min(window, parts - first)
+                yield Request(commands)
+                inFlight = 0
+                if(progress): progress.update(min(len(data), (first + window) * partSize) - first * partSize, len(data))
+            answer = yield from self.commandSteps(at.Command.GetImageUploadResult)
+            result = answer.decode('ascii').split(':')[-1].strip() # ^DMPU: 0
+            if(result != '0'):
+                raise at.AtException('Device rejected the picture (upload result {0})'.format(result))
+        except Exception:
+            # after the first error of a batch, the answers of the other parts are still on their way
+            # and must not be taken for the answers of the next commands
+            if(inFlight): yield from self.discardAnswersSteps(inFlight - 1) # one answer ended the batch
+            yield Request(wait=self.delay.AfterInvoke, flush=True)
+            raise
+
+    def discardAnswersSteps(self, answers):
+        # reads up to `answers` AT results, stops as soon as the device stays silent for TimeoutRead
+        for i in range(answers):
+            try:
+                yield Request(b'')
+            except (at.AtException, at.IncompleteAtResponseException):
+                pass
+            except transport.ReadTimeoutException:
+                return
+
+    def getMemoryStatusSteps(self):
+        status = []
+        for command in [obex.AppParametersCommand.MemoryStatusTotal, obex.AppParametersCommand.MemoryStatusFree]:
+            request = Request(
+                obex.compileMessage(
+                    obex.OpCode.Get+obex.Mask.Final,
+                    obex.compileMessage( obex.Header.AppParameters, command )
+                ),
+                isObex=True
+            )
+            response = yield from self.operationSteps(lambda: self.packetSteps(request))
+            status.append(obex.parseMemoryResponse(response))
+        return tuple(status)
+
+    def listFolderSteps(self, folder):
+        def attemptSteps():
+            parser = obex.FileListParser()
+            yield from self.packetSteps(Request(
+                obex.compileMessage(
+                    obex.OpCode.SetPath,
+                    struct.pack('B', obex.SetPathFlags.DontCreate)
+                    + struct.pack('B', obex.SetPathFlags.Constants)
+                    + obex.compileNameHeader( folder )
+                ),
+                isObex=True
+            ))
+            yield from self.srmFirstSteps(lambda srmHeader, headers: Request(
+                obex.compileMessage(
+                    obex.OpCode.Get+obex.Mask.Final,
+                    obex.compileMessage( obex.Header.Type, obex.ObjectMimeType.FolderListing ) + srmHeader
+                ),
+                isObex=True, sink=parser, headers=headers
+            ))
+            return parser.close()
+        files = yield from self.operationSteps(attemptSteps)
+        return files
+
+
+class QuickSyncClient(BaseQuickSyncClient):
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, *args):
+        self.close()
+
+    def run(self, steps):
+        response, error = None, None
+        while True:
+            try:
+                request = steps.throw(error) if(error) else steps.send(response)
+            except StopIteration as e:
+                return e.value
+            try:
+                response, error = self.execute(request), None
+            except Exception as e:
+                response, error = None, e
+
+    def execute(self, request):
+        sent = time.monotonic()
+        if(request.data is None):
+            time.sleep(request.wait or 0)
+            if(request.flush): self.ser.reset_input_buffer()
+            if(self.timing): self.timing.record(request, sent, time.monotonic(), time.monotonic() - sent)
+            return None
+        reader = self.send(request)
+        try:
+            while(not reader.poll()):
+                if(reader.outgoing): self.ser.write(reader.takeOutgoing())
+                if(request.noResponse and not reader.bytesIn and not self.ser.in_waiting):
+                    break # Single Response Mode: only read if the device answered anyway (error, wait request)
+                data = transport.readAvailable(self.ser, self.delay.TimeoutRead)
+                if(not data): raise self.timeoutException()
+                reader.feed(data)
+        except Exception as e:
+            if(self.timing): self.timing.record(request, sent, time.monotonic(), 0, reader, e)
+            raise
+        slept = 0
+        if(request.wait):
+            # mode switches: the device needs some settle time before it accepts the next command
+            received = time.monotonic()
+            time.sleep(max(0, request.wait - (received - sent)))
+            slept = time.monotonic() - received
+        if(self.timing): self.timing.record(request, sent, time.monotonic(), slept, reader)
+        return reader.response
+
+    def sendAndReadResponse(self, data, wait=None, isObex=False, sink=None, progress=None):
+        return self.execute(Request(data, wait, isObex, sink, progress))
+
+    @contextmanager
+    def obexSession(self):
+        self.enterObex()
+        try:
+            yield self
+        finally:
+            self.exitObex()
+
+    def command(self, command, *args, wait=None):
+        return self.run(self.commandSteps(command, *args, wait=wait))
+    def dial(self, number):
+        return self.run(self.dialSteps(number))
+    def querySerial(self):
+        return self.run(self.querySerialSteps())
+    def queryDeviceModel(self):
+        return self.run(self.queryDeviceModelSteps())
+    def enterObex(self):
+        return self.run(self.enterObexSteps())
+    def exitObex(self):
+        return self.run(self.exitObexSteps())
+    def getObject(self, path, sink=None, progress=None):
+        return self.run(self.getObjectSteps(path, sink, progress))
+    def putObject(self, path, data=None):
+        return self.run(self.putObjectSteps(path, data))
+    def putFile(self, path, f, total, progress=None):
+        return self.run(self.putFileSteps(path, f, total, progress))
+    def putImage(self, path, data, progress=None):
+        return self.run(self.putImageSteps(path, data, progress))
+    def getMemoryStatus(self):
+        return self.run(self.getMemoryStatusSteps())
+    def listFolder(self, folder):
+        return self.run(self.listFolderSteps(folder))
+    def getContacts(self, sink=None, progress=None):
+        return self.getObject(obex.FilePath.PhoneBook, sink, progress)
+    def createContact(self, vcard):
+        return self.putObject(obex.FilePath.NewVCardGQS, vcard)
+    def editContact(self, luid, vcard):
+        return self.putObject(obex.FilePath.VCardLuid.format(luid), vcard)
+    def deleteContact(self, luid):
+        return self.putObject(obex.FilePath.VCardLuid.format(luid))
+    def deleteFile(self, path):
+        return self.putObject(path)
+
+
+class AsyncQuickSyncClient(BaseQuickSyncClient):
+    # drives the device from an asyncio event loop; the serial port is non-blocking and only
+    # read or written when the loop reports it as ready, so many devices can share one loop
+    def open(self):
+        super().open()
+        os.set_blocking(self.ser.fileno(), False)
+        return self
+
+    async def __aenter__(self):
+        return self.open()
+
+    async def __aexit__(self, *args):
+        self.close()
+
+    async def run(self, steps):
+        response, error = None, None
+        while True:
+            try:
+                request = steps.throw(error) if(error) else steps.send(response)
+            except StopIteration as e:
+                return e.value
+            try:
+                response, error = await self.execute(request), None
+            except Exception as e:
+                response, error = None, e
+
+    async def readAvailable(self, timeout):
+        import asyncio # imported here, the blocking client should not pay for loading asyncio
+        loop = asyncio.get_running_loop()
+        readable = loop.create_future()
+        fd = self.ser.fileno()
+        loop.add_reader(fd, lambda: readable.done() or readable.set_result(None))
+        try:
+            await asyncio.wait_for(readable, timeout)
+        except asyncio.TimeoutError:
+            return b''
+        finally:
+            loop.remove_reader(fd)
+        return self.ser.read(max(1, self.ser.in_waiting))
+
+    async def write(self, data):
+        # writes as much as the driver takes, the rest when the loop reports the port as writable again
+        import asyncio
+        loop = asyncio.get_running_loop()
+        fd = self.ser.fileno()
+        data = memoryview(data)
+        while data:
+            try:
+                data = data[os.write(fd, data):]
+                continue
+            except BlockingIOError:
+                pass
+            writable = loop.create_future()
+            loop.add_writer(fd, lambda: writable.done() or writable.set_result(None))
+            try:
+                await asyncio.wait_for(writable, self.delay.TimeoutWrite)
+            except asyncio.TimeoutError:
+                import serial
+                raise serial.SerialTimeoutException('Write timeout')
+            finally:
+                loop.remove_writer(fd)
+
+    async def send(self, request):
+        self.printSend(request)
+        await self.write(request.data)
+        return self.startResponse(request)
+
+    async def execute(self, request):
+        import asyncio
+        sent = time.monotonic()
+        if(request.data is None):
+            await asyncio.sleep(request.wait or 0)
+            if(request.flush): self.ser.reset_input_buffer()
+            if(self.timing): self.timing.record(request, sent, time.monotonic(), time.monotonic() - sent)
+            return None
+        reader = await self.send(request)
+        try:
+            while(not reader.poll()):
+                if(reader.outgoing): await self.write(reader.takeOutgoing())
+                if(request.noResponse and not reader.bytesIn and not self.ser.in_waiting):
+                    break # Single Response Mode: only read if the device answered anyway (error, wait request)
+                data = await self.readAvailable(self.delay.TimeoutRead)
+                if(not data): raise self.timeoutException()
+                reader.feed(data)
+        except Exception as e:
+            if(self.timing): self.timing.record(request, sent, time.monotonic(), 0, reader, e)
+            raise
+        slept = 0
+        if(request.wait):
+            received = time.monotonic()
+            await asyncio.sleep(max(0, request.wait - (received - sent)))
+            slept = time.monotonic() - received
+        if(self.timing): self.timing.record(request, sent, time.monotonic(), slept, reader)
+        return reader.response
+
+    async def sendAndReadResponse(self, data, wait=None, isObex=False, sink=None, progress=None):
+        return await self.execute(Request(data, wait, isObex, sink, progress))
+
+    @asynccontextmanager
+    async def obexSession(self):
+        await self.enterObex()
+        try:
+            yield self
+        finally:
+            await self.exitObex()
+
+    async def command(self, command, *args, wait=None):
+        return await self.run(self.commandSteps(command, *args, wait=wait))
+    async def dial(self, number):
+        return await self.run(self.dialSteps(number))
+    async def querySerial(self):
+        return await self.run(self.querySerialSteps())
+    async def queryDeviceModel(self):
+        return await self.run(self.queryDeviceModelSteps())
+    async def enterObex(self):
+        return await self.run(self.enterObexSteps())
+    async def exitObex(self):
+        return await self.run(self.exitObexSteps())
+    async def getObject(self, path, sink=None, progress=None):
+        return await self.run(self.getObjectSteps(path, sink, progress))
+    async def putObject(self, path, data=None):
+        return await self.run(self.putObjectSteps(path, data))
+    async def putFile(self, path, f, total, progress=None):
+        return await self.run(self.putFileSteps(path, f, total, progress))
+    async def putImage(self, path, data, progress=None):
+        return await self.run(self.putImageSteps(path, data, progress))
+    async def getMemoryStatus(self):
+        return await self.run(self.getMemoryStatusSteps())
+    async def listFolder(self, folder):
+        return await self.run(self.listFolderSteps(folder))
+    async def getContacts(self, sink=None, progress=None):
+        return await self.getObject(obex.FilePath.PhoneBook, sink, progress)
+    async def createContact(self, vcard):
+        return await self.putObject(obex.FilePath.NewVCardGQS, vcard)
+    async def editContact(self, luid, vcard):
+        return await self.putObject(obex.FilePath.VCardLuid.format(luid), vcard)
+    async def deleteContact(self, luid):
+        return await self.putObject(obex.FilePath.VCardLuid.format(luid))
+    async def deleteFile(self, path):
+        return await self.putObject(path)
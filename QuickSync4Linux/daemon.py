@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+
+# quicksyncd keeps the serial port open and executes requests of local clients one after another.
+# Protocol: the client sends one JSON object per connection, terminated by a line break:
+#   {"action": "dial", "options": "1234567890", "file": "-", "cwd": "/home/user", "device": "/dev/ttyACM0", "timing": false, "stdin": "",
+#    "baud": null, "verbose": 0, "retries": 3, "srm": true, "adaptive": true, "atUpload": false}
+# (the connection options only apply to this request, "baud": null keeps the speed of the daemon)
+# and receives one JSON object before the connection is closed:
+#   {"returncode": 0, "output": "...", "error": "", "timings": [...]}
+#
+# This module is also imported by every `quicksync` call to look for a running daemon,
+# so everything else is only imported when it is needed.
+
+from contextlib import contextmanager
+import sys
+import os
+
+
+def defaultSocketPath():
+    runtimeDir = os.environ.get('XDG_RUNTIME_DIR')
+    if(runtimeDir): return os.path.join(runtimeDir, 'quicksync4linux.sock')
+    return '/tmp/quicksync4linux-{0}.sock'.format(os.getuid())
+
+def forward(socketPath, args, recorder=None):
+    # send the request to the daemon and print its result as if we executed it ourselves
+    import socket
+    import struct
+    import json
+    request = {
+        'action': args.action,
+        'options': args.options,
+        'file': args.file,
+        'cwd': os.getcwd(),
+        'device': args.device,
+        'timing': recorder is not None,
+        'baud': args.baud,
+        'verbose': args.verbose,
+        'retries': args.retries,
+        'srm': not args.no_srm,
+        'adaptive': not args.no_adaptive,
+        'atUpload': args.at_upload,
+    }
+    if(args.file == '-' and args.action in ['createcontacts', 'batch']):
+        request['stdin'] = sys.stdin.read()
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(socketPath)
+        # the socket path may be predictable (/tmp), never send a request to a daemon of another user
+        pid, uid, gid = struct.unpack('3i', sock.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize('3i')))
+        if(uid != os.getuid()):
+            print('Ignoring quicksyncd socket {0} of another user (uid {1})'.format(socketPath, uid), file=sys.stderr)
+            raise ConnectionRefusedError('quicksyncd socket of another user')
+        sock.sendall(json.dumps(request).encode('utf8') + b'\n')
+        data = b''
+        while True:
+            chunk = sock.recv(65536)
+            if(not chunk): break
+            data += chunk
+
+    response = json.loads(data.decode('utf8'))
+    if(response.get('refused')):
+        # the daemon serves another device, the caller uses the serial port directly
+        raise ConnectionRefusedError(response['refused'])
+    if(recorder is not None):
+        recorder.extend(response.get('timings', []))
+    if(response.get('output')):
+        sys.stdout.write(response['output'])
+        sys.stdout.flush()
+    if(response.get('error')):
+        print(response['error'], file=sys.stderr)
+    return response.get('returncode', 1)
+
+
+class QuickSyncDaemon:
+    def __init__(self, device, baud, configParser, configPath, verbose=0):
+        import threading
+        self.device = device
+        self.baud = baud
+        self.configParser = configParser
+        self.configPath = configPath
+        self.verbose = verbose
+        self.client = None
+        # only one request may use the serial port at a time
+        self.lock = threading.Lock()
+
+    def getClient(self):
+        from .client import QuickSyncClient
+        from . import quicksync
+        if(self.client is None):
+            self.client = QuickSyncClient(self.device, self.baud).open()
+            quicksync.loadDeviceProfile(self.client, self.configParser)
+        return self.client
+
+    def resetClient(self):
+        # after an error, bring the device back into AT mode or reopen the port with the next request
+        if(self.client is None): return
+        try:
+            if(self.client.inObex):
+                self.client.exitObex()
+                return
+        except Exception:
+            pass
+        try:
+            self.client.close()
+        except Exception:
+            pass
+        self.client = None
+
+    @contextmanager
+    def requestOptions(self, client, request):
+        # the connection options of the calling quicksync apply to its request only
+        saved = (client.ser.baudrate, client.verbose, client.retries, client.singleResponseMode, client.adaptiveTransfer)
+        try:
+            if(request.get('baud')): client.ser.baudrate = int(request['baud'])
+            client.verbose = request.get('verbose', client.verbose)
+            client.retries = request.get('retries', client.retries)
+            client.singleResponseMode = request.get('srm', client.singleResponseMode)
+            client.adaptiveTransfer = request.get('adaptive', client.adaptiveTransfer)
+            yield client
+        finally:
+            if(client.ser.baudrate != saved[0]): client.ser.baudrate = saved[0]
+            client.verbose, client.retries, client.singleResponseMode, client.adaptiveTransfer = saved[1:]
+
+    def keepAlive(self):
+        # check the connection while idle, so that a replugged device is reopened before the next request
+        from . import at
+        with self.lock:
+            try:
+                self.getClient().command(at.Command.Ping)
+            except Exception as e:
+                if(self.verbose): print('Keepalive failed:', e)
+                self.resetClient()
+
+    def execute(self, request):
+        if(request.get('device') and os.path.realpath(request['device']) != os.path.realpath(self.device)):
+            return {'refused': 'quicksyncd serves '+self.device}
+
+        from contextlib import redirect_stdout, redirect_stderr
+        from argparse import Namespace
+        from . import quicksync
+        import io
+
+        output = io.TextIOWrapper(io.BytesIO(), encoding='utf8', write_through=True)
+        errors = io.StringIO()
+        args = Namespace(action=request.get('action'), options=request.get('options'), file=request.get('file', '-'), at_upload=request.get('atUpload', False))
+        recorder = None
+        with self.lock:
+            if(self.verbose): print('Request:', args.action, args.options or '')
+            stdin = sys.stdin
+            sys.stdin = io.StringIO(request.get('stdin', ''))
+            try:
+                if(request.get('cwd')): os.chdir(request['cwd'])
+                client = self.getClient()
+                if(request.get('timing')):
+                    from .timing import TimingRecorder
+                    recorder = client.timing = TimingRecorder()
+                with redirect_stdout(output), redirect_stderr(errors), self.requestOptions(client, request):
+                    returnCode = quicksync.runAction(client, args, self.configParser, self.configPath)
+            except Exception as e:
+                print(str(e), file=errors)
+                returnCode = 1
+                self.resetClient()
+            finally:
+                sys.stdin = stdin
+                if(self.client): self.client.timing = None
+        return {
+            'returncode': returnCode,
+            'output': output.buffer.getvalue().decode('utf8', errors='replace'),
+            'error': errors.getvalue().strip(),
+            'timings': recorder.toDicts() if(recorder) else [],
+        }
+
+    def createServer(self, socketPath):
+        # UNIX socket server which executes every request with this daemon
+        import socketserver
+        import socket
+        import json
+        daemon = self
+
+        class RequestHandler(socketserver.StreamRequestHandler):
+            def handle(self):
+                try:
+                    request = json.loads(self.rfile.readline().decode('utf8'))
+                    response = daemon.execute(request)
+                except ValueError as e:
+                    response = {'returncode': 1, 'output': '', 'error': 'Invalid request: '+str(e)}
+                self.wfile.write(json.dumps(response).encode('utf8') + b'\n')
+
+        if(os.path.exists(socketPath)):
+            try:
+                with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                    sock.connect(socketPath)
+                raise Exception('quicksyncd is already running on '+socketPath)
+            except ConnectionError:
+                os.unlink(socketPath) # stale socket of a crashed daemon
+
+        # only the user may connect, the socket is created without access for others right away
+        umask = os.umask(0o177)
+        try:
+            return socketserver.ThreadingUnixStreamServer(socketPath, RequestHandler)
+        finally:
+            os.umask(umask)
+
+    def serve(self, socketPath, keepAliveInterval):
+        import threading
+        import signal
+        server = self.createServer(socketPath)
+
+        def keepAliveLoop():
+            while not stopped.wait(keepAliveInterval):
+                self.keepAlive()
+        stopped = threading.Event()
+        if(keepAliveInterval):
+            threading.Thread(target=keepAliveLoop, daemon=True).start()
+
+        print('quicksyncd listening on', socketPath, 'for', self.device, flush=True)
+        try:
+            self.getClient()
+        except Exception as e:
+            print('Device not available yet:', e, flush=True)
+        def terminate(signum, frame):
+            raise KeyboardInterrupt
+        signal.signal(signal.SIGTERM, terminate)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            stopped.set()
+            server.server_close()
+            os.unlink(socketPath)
+            self.resetClient()
+
+
+def main():
+    from pathlib import Path
+    import configparser
+    import argparse
+    from .__init__ import __version__
+
+    config = {}
+    configPath = str(Path.home())+'/.config/quicksync4linux.ini'
+    configParser = configparser.ConfigParser()
+    configParser.read(configPath)
+    if(configParser.has_section('general')): config = dict(configParser.items('general'))
+
+    parser = argparse.ArgumentParser(
+        prog='quicksyncd',
+        description='Keep the serial port of a Gigaset device open and serve QuickSync4Linux requests over a UNIX socket',
+        epilog=f'Version {__version__}'
+    )
+    parser.add_argument('-d', '--device', default=config.get('device', '/dev/ttyACM0'), help='serial port device')
+    parser.add_argument('-b', '--baud', default=None, help='serial port speed, default: the rate found by "linktest" for the device, or 9600')
+    parser.add_argument('-s', '--socket', default=config.get('socket', defaultSocketPath()), help='UNIX socket path')
+    parser.add_argument('-k', '--keepalive', type=float, default=30, help='seconds between connection checks while idle, 0 to disable')
+    parser.add_argument('-v', '--verbose', action='count', default=0, help='print received requests')
+    args = parser.parse_args()
+    if(args.baud is None):
+        from .quicksync import deviceBaud
+        args.baud = deviceBaud(configParser, args.device, config.get('baud', 9600))
+
+    QuickSyncDaemon(args.device, args.baud, configParser, configPath, args.verbose).serve(args.socket, args.keepalive)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+
+# Runs one QuickSync4Linux action on many devices in parallel. Every device gets its own
+# process, so devices can not disturb each other (delay profiles, serial state).
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import subprocess
+import argparse
+import glob
+import time
+import sys
+import os
+
+from .__init__ import __version__
+
+
+def readInventory(path):
+    # one device (or glob pattern) per line, '#' starts a comment
+    patterns = []
+    with open(path, 'r') as f:
+        for line in f:
+            line = line.split('#', 1)[0].strip()
+            if(line): patterns.append(line)
+    return patterns
+
+def expandDevices(patterns):
+    devices = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern]
+        for device in matches:
+            if(device not in devices): devices.append(device)
+    return devices
+
+def deviceFile(file, device):
+    # allow one output/input file per device, e.g. --file "contacts-{name}.vcf"
+    return file.format(device=device, name=os.path.basename(device))
+
+def runAction(device, args):
+    command = [sys.executable, '-m', 'QuickSync4Linux', args.action]
+    if(args.options): command.append(args.options)
+    command += ['--device', device, '--file', deviceFile(args.file, device)]
+    if(args.baud): command += ['--baud', str(args.baud)]
+
+    start = time.monotonic()
+    try:
+        process = subprocess.run(
+            command, stdin=subprocess.DEVNULL, capture_output=True, text=True, timeout=args.timeout
+        )
+        returnCode, output, error = process.returncode, process.stdout, process.stderr
+    except subprocess.TimeoutExpired as e:
+        returnCode, output, error = None, e.stdout or '', 'Timeout after {0} seconds'.format(args.timeout)
+    if(isinstance(output, bytes)): output = output.decode('utf8', errors='replace')
+    return {
+        'device': device,
+        'success': returnCode == 0,
+        'returncode': returnCode,
+        'duration': time.monotonic() - start,
+        'output': output,
+        'error': error,
+    }
+
+def printResult(result, verbose):
+    print('[{0}] {1} ({2:.1f}s)'.format(
+        result['device'], 'OK' if result['success'] else 'FAILED', result['duration']
+    ), flush=True)
+    if(verbose):
+        for text in [result['output'], result['error']]:
+            for line in text.strip().splitlines():
+                print('    '+line)
+    elif(not result['success']):
+        # the last line of a traceback tells what went wrong
+        lines = result['error'].strip().splitlines()
+        if(lines): print('    '+lines[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog='QuickSync4Linux.fleet',
+        description='Run a QuickSync4Linux action on many Gigaset devices in parallel',
+        epilog=f'Version {__version__}'
+    )
+    parser.add_argument('action', help='any QuickSync4Linux action, e.g. createcontacts or batch')
+    parser.add_argument('options', nargs='?', help='options for the action, see QuickSync4Linux --help')
+    parser.add_argument('-D', '--devices', action='append', default=[], help='device path or glob pattern like "/dev/ttyACM*", can be given multiple times')
+    parser.add_argument('-i', '--inventory', help='file with one device path or glob pattern per line')
+    parser.add_argument('-f', '--file', default='-', help='file for the action; "{device}" and "{name}" are replaced by the device path and its base name')
+    parser.add_argument('-b', '--baud', default=None)
+    parser.add_argument('-j', '--jobs', type=int, default=4, help='max number of devices processed at the same time')
+    parser.add_argument('-t', '--timeout', type=float, default=None, help='max seconds per device')
+    parser.add_argument('-v', '--verbose', action='store_true', help='print the output of successful devices too')
+    args = parser.parse_args()
+
+    patterns = list(args.devices)
+    if(args.inventory): patterns += readInventory(args.inventory)
+    devices = expandDevices(patterns)
+    if(not devices):
+        print('No devices found, please specify --devices or --inventory')
+        exit(1)
+
+    start = time.monotonic()
+    results = []
+    with ThreadPoolExecutor(max_workers=max(1, args.jobs)) as executor:
+        futures = [executor.submit(runAction, device, args) for device in devices]
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+            printResult(result, args.verbose)
+
+    failed = [result['device'] for result in results if not result['success']]
+    print()
+    print('{0} devices, {1} succeeded, {2} failed, {3:.1f}s total'.format(
+        len(results), len(results)-len(failed), len(failed), time.monotonic()-start
+    ))
+    if(failed):
+        print('Failed:', ' '.join(sorted(failed)))
+        exit(1)
+
+if __name__ == '__main__':
+    main()
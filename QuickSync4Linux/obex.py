@@ -1,8 +1,8 @@
 #!/usr/bin/env python3
 
-from xml.dom import minidom, expatbuilder
 from enum import Enum
 import struct
+import re
 
 # https://en.wikipedia.org/wiki/OBject_EXchange
 # https://btprodspecificationrefs.blob.core.windows.net/ext-ref/IrDA/OBEX15.pdf
@@ -11,6 +11,9 @@ class Connection:
     Version = b"\x10"
     Flags   = b"\x00"
     MaxPacketSize = b"\xff\xfe"
+    # used if the device does not tell its max packet size (proven value for Gigaset devices)
+    DefaultPacketSize = 1024
+    MinPacketSize = 255
 
 class SetPathFlags:
     LayerUp    = 0b00000001 # backup a level before applying name (equivalent to ../)
@@ -82,6 +85,11 @@ class ReCode(int, Enum):
     DatabaseFull        = 0x60
     DatabaseLocked      = 0x61
 
+# the device can not handle the request right now, it may succeed when sent again later
+BusyReCodes = [ReCode.ServiceUnavailable, ReCode.DatabaseLocked]
+# answers of devices which do not know the Single Response Mode header
+SrmRejectReCodes = [ReCode.BadRequest, ReCode.NotImplemented, ReCode.NotAcceptable]
+
 class Header:
     Count         = 0xc0
     Name          = 0x01
@@ -112,6 +120,27 @@ class Header:
     # 0x19 to 0x2f = Reserved
     # 0x30 to 0x3f = User defined
 
+class SingleResponseMode:
+    # values of Header.SingleResponseMode: with Enable in the first packet of a Get/Put and the same
+    # answer of the device, the packets of the operation are sent without waiting for each other
+    Disable  = 0x00
+    Enable   = 0x01
+    Indicate = 0x02
+
+class SingleResponseParams:
+    # values of Header.SingleResponseParams: the sender asks to wait for its next packet
+    Next        = 0x00
+    Wait        = 0x01
+    NextAndWait = 0x02
+
+class HeaderEncoding:
+    # the upper two bits of the header id tell how the header length is encoded
+    Mask      = 0b11000000
+    Unicode   = 0b00000000 # 2 byte length prefix, null terminated UTF-16
+    ByteSeq   = 0b01000000 # 2 byte length prefix
+    OneByte   = 0b10000000
+    FourBytes = 0b11000000
+
 class AppParametersCommand:
     MemoryStatusTotal = b"\x32\x01\x01"
     MemoryStatusFree  = b"\x32\x01\x02"
@@ -126,6 +155,7 @@ class FolderPath:
     ClipPictures = "/Clip Pictures"
     ScreenSavers = "/Pictures"
     Ringtones    = "/Sounds"
+    Media        = [ScreenSavers, ClipPictures, Ringtones]
 
 class FilePath:
     PhoneBook     = "/telecom/pb.vcf"
@@ -133,6 +163,7 @@ class FilePath:
     DevInfo       = "/telecom/devinfo.txt"
     LuidCC        = "/telecom/pb/luid/cc.log"
     Luid0         = "/telecom/pb/luid/0.log"
+    LuidChangeLog = "/telecom/pb/luid/{0}.log"
     VCardLuid     = "/telecom/pb/luid/{0}.vcf"
     NewVCardGQS   = "/telecom/pb/luid/zapis.vcf"
     NewVCardGDS   = "/telecom/pb/luid/.vcf"
@@ -147,14 +178,17 @@ class ObjectMimeType:
 class QuickSyncOperation:
     Download = 1
     Upload   = 2
+    Connect  = 3
 
 class ObexException(Exception):
-    pass
+    def __init__(self, message, code=None):
+        super().__init__(message)
+        self.code = code
 class InvalidObexLengthException(Exception):
     pass
 
 def compileMessage(opcode, payload=b''):
-    if(not isinstance(payload, (bytes, bytearray))):
+    if(not isinstance(payload, (bytes, bytearray, memoryview))):
         payload = payload.encode('ascii')
     return struct.pack('B', opcode) + struct.pack('>H', len(payload)+3) + payload
 
@@ -170,6 +204,14 @@ def compileNameHeader(text):
 def compileLengthHeader(length):
     return struct.pack('B', Header.Length) + struct.pack('>I', length)
 
+def compileSrmHeader(mode=SingleResponseMode.Enable):
+    return struct.pack('BB', Header.SingleResponseMode, mode)
+
+def srmStreaming(headers):
+    # whether the device agreed to Single Response Mode and does not ask us to wait for its next packet
+    return (headers.get(Header.SingleResponseMode) == SingleResponseMode.Enable
+        and headers.get(Header.SingleResponseParams) not in [SingleResponseParams.Wait, SingleResponseParams.NextAndWait])
+
 def parseMemoryResponse(data, offset=1):
     if(data[offset] == 1):
         return data[offset + 1]
@@ -179,21 +221,34 @@ def parseMemoryResponse(data, offset=1):
         return struct.unpack('>I', data[offset+1:])[0]
     else: return 0
 
-def evaluateResponse(buf, results, ser, isUpload):
+def parseConnectResponse(data):
+    # version (1 byte), flags (1 byte) and max packet size (2 bytes) of the connect response
+    if(len(data) < 4):
+        return Connection.DefaultPacketSize
+    return max(Connection.MinPacketSize, struct.unpack('>H', data[2:4])[0])
+
+def evaluateResponse(buf, results, ser, operation, headers=None):
     if(len(buf) < 3
-    or len(buf) != struct.unpack('>H', buf[1:3])[0]):
+    or len(buf) != struct.unpack_from('>H', buf, 1)[0]):
         raise InvalidObexLengthException()
 
     elif(buf[0] & Mask.NotFinal == ReCode.Continue and buf[0] & Mask.Final):
-        if(isUpload):
+        if(operation == QuickSyncOperation.Upload):
+            collectHeaders(parseHeaders(buf, 3), [], headers)
             return True
         else:
-            results.extend(parseHeaders(buf[3:]))
-            ser.write(compileMessage(OpCode.Get+Mask.Final))
+            collectHeaders(parseHeaders(buf, 3), results, headers)
+            # ask for the next packet, unless the caller does this itself (Single Response Mode)
+            if(ser is not None): ser.write(compileMessage(OpCode.Get+Mask.Final))
             return False
 
     elif(buf[0] & Mask.NotFinal == ReCode.Success):
-        results.extend(parseHeaders(buf[3:]))
+        if(operation == QuickSyncOperation.Connect):
+            # connect responses have additional fields before the headers
+            results.append(memoryview(buf)[3:7])
+            collectHeaders(parseHeaders(buf, 7), [], headers)
+            return True
+        collectHeaders(parseHeaders(buf, 3), results, headers)
         return True
 
     else:
@@ -201,61 +256,163 @@ def evaluateResponse(buf, results, ser, isUpload):
         try:
             errorString = str(ReCode(buf[0] & Mask.NotFinal))
         except ValueError: pass
-        raise ObexException('Device reported an obex command error, code {:02X} ({})'.format(buf[0], errorString))
-
-def parseHeaders(obj):
-    results = []
-
-    if(len(obj) < 3):
-        return results
-
-    currOffset = 0
-    while True:
-        currLength = 1
-
-        if(len(obj) <= currOffset): break
-
-        if(obj[currOffset] == Header.Length):
-            currLength = 5
-            print('Payload Length:', struct.unpack('>I', obj[currOffset+1:currOffset+5])[0])
-
-        elif(obj[currOffset] == Header.Count):
-            currLength = 5
-            print('Payload Count:', struct.unpack('>I', obj[currOffset+1:currOffset+5])[0])
-
-        elif(obj[currOffset] == Header.Body
-        or obj[currOffset] == Header.EndOfBody
-        or obj[currOffset] == Header.AppParameters):
-            if(len(obj) < currOffset+3): break
-            currLength = struct.unpack('>H', obj[currOffset+1:currOffset+3])[0]
-            if(currLength == 0): break
-
-            currHeader = obj[currOffset:currOffset+currLength]
-            if(len(currHeader) != currLength):
-                raise InvalidObexLengthException()
-
-            results.append(currHeader[3:])
-
+        raise ObexException('Device reported an obex command error, code {:02X} ({})'.format(buf[0], errorString), buf[0] & Mask.NotFinal)
+
+class ParsedHeader:
+    # a header inside a received packet, referenced by offset instead of copying its content
+    __slots__ = ['id', 'packet', 'offset', 'length']
+
+    def __init__(self, id, packet, offset, length):
+        self.id = id
+        self.packet = packet
+        self.offset = offset
+        self.length = length
+
+    def value(self):
+        encoding = self.id & HeaderEncoding.Mask
+        if(encoding == HeaderEncoding.FourBytes):
+            return struct.unpack_from('>I', self.packet, self.offset+1)[0]
+        elif(encoding == HeaderEncoding.OneByte):
+            return self.packet[self.offset+1]
         else:
-            #print('Unknown Header:', struct.pack('B', obj[currOffset]))
-            break
-
-        currOffset += currLength
-
-    return results
-
-def parseFileListXml(xmlstring):
-    files = []
-    maxLenName = 0
-    document = minidom.parseString(xmlstring).documentElement
-    for file in document.getElementsByTagName('file'):
-        maxLenName = max(maxLenName, len(file.getAttribute('name')))
-        files.append({
-            'name': file.getAttribute('name'),
-            'size': file.getAttribute('size'),
-            'fileid': file.getAttribute('fileid'),
-            'modified': file.getAttribute('modified'),
-            'user-perm': file.getAttribute('user-perm'),
-            'group-perm': file.getAttribute('group-perm'),
-        })
-    return files, maxLenName
+            return memoryview(self.packet)[self.offset+3:self.offset+self.length]
+
+    def __repr__(self):
+        return 'ParsedHeader(0x{:02x}, offset={}, length={})'.format(self.id, self.offset, self.length)
+
+def parseHeaders(obj, offset=0):
+    headers = []
+    while(offset < len(obj)):
+        encoding = obj[offset] & HeaderEncoding.Mask
+        if(encoding == HeaderEncoding.FourBytes):
+            length = 5
+        elif(encoding == HeaderEncoding.OneByte):
+            length = 2
+        else:
+            if(len(obj) < offset+3): break
+            length = struct.unpack_from('>H', obj, offset+1)[0]
+            if(length < 3): break
+
+        if(len(obj) < offset+length):
+            raise InvalidObexLengthException()
+        headers.append(ParsedHeader(obj[offset], obj, offset, length))
+        offset += length
+
+    return headers
+
+def collectHeaders(parsedHeaders, results, headers=None):
+    # body/app parameter contents go into `results`, all other header values into the `headers` dict
+    for header in parsedHeaders:
+        if(header.id in [Header.Body, Header.EndOfBody, Header.AppParameters]):
+            results.append(header.value())
+        elif(headers is not None):
+            headers[header.id] = header.value()
+
+class ObexFramer:
+    # collects received bytes and cuts them into complete packets; the 3 byte
+    # packet header is only parsed once, afterwards we know exactly what is missing
+    def __init__(self):
+        self.buf = bytearray()
+        self.expected = None
+
+    def feed(self, data):
+        self.buf += data
+
+    def packet(self):
+        if(self.expected is None):
+            if(len(self.buf) < 3): return None
+            self.expected = struct.unpack_from('>H', self.buf, 1)[0]
+            if(self.expected < 3):
+                raise InvalidObexLengthException()
+        if(len(self.buf) < self.expected): return None
+        with memoryview(self.buf)[:self.expected] as view:
+            packet = bytes(view) # the only copy, the view is released before the buffer shrinks
+        del self.buf[:self.expected]
+        self.expected = None
+        return packet
+
+def parseChangeLog(text):
+    # IrMC change log: some "key:value" lines (SN, DID, Total-Records, ...) followed by
+    # change entries "<type>:<change counter>:<timestamp>:<luid>" with type M (modified/added),
+    # H (hard deleted) or D (deleted); a "*" line means that the log does not reach back far enough
+    changeLog = {'changes': [], 'overflow': False}
+    for line in text.splitlines():
+        line = line.strip()
+        match = re.fullmatch(r"([MHD]):(\d+):[^:]*:(.+)", line)
+        if(match):
+            changeLog['changes'].append((match.group(1), int(match.group(2)), match.group(3)))
+        elif(line == '*'):
+            changeLog['overflow'] = True
+        elif(':' in line):
+            key, value = line.split(':', 1)
+            changeLog[key.strip().lower()] = value.strip()
+    return changeLog
+
+class FileEntry:
+    # one file of a folder listing
+    __slots__ = ('name', 'size', 'fileid', 'modified', 'userPerm', 'groupPerm')
+
+    def __init__(self, name, size=0, fileid='', modified='', userPerm='', groupPerm=''):
+        self.name = name
+        self.size = size
+        self.fileid = fileid
+        self.modified = modified
+        self.userPerm = userPerm
+        self.groupPerm = groupPerm
+
+    @classmethod
+    def fromAttributes(cls, attributes):
+        # attribute names as used in the folder listing XML
+        return cls(
+            attributes.get('name', ''),
+            int(attributes.get('size') or 0),
+            attributes.get('fileid', ''),
+            attributes.get('modified', ''),
+            attributes.get('user-perm', ''),
+            attributes.get('group-perm', ''),
+        )
+
+    def attributes(self):
+        return {
+            'name': self.name,
+            'size': self.size,
+            'fileid': self.fileid,
+            'modified': self.modified,
+            'user-perm': self.userPerm,
+            'group-perm': self.groupPerm,
+        }
+
+class FileListParser:
+    # streaming folder listing parser, can be used as sink of a Get request so that
+    # entries are parsed while the listing is still being received
+    def __init__(self):
+        from xml.parsers import expat
+        self.parser = expat.ParserCreate()
+        self.parser.StartElementHandler = self.startElement
+        self.files = []
+
+    def startElement(self, name, attributes):
+        if(name == 'file'):
+            self.files.append(FileEntry.fromAttributes(attributes))
+
+    def write(self, data):
+        self.parser.Parse(data, False)
+        return len(data)
+
+    def close(self):
+        self.parser.Parse(b'', True)
+        return self.files
+
+def iterFileList(chunks):
+    # yields the file entries of a folder listing given as iterable of byte chunks
+    parser = FileListParser()
+    for chunk in chunks:
+        parser.write(chunk)
+        yield from parser.files
+        parser.files.clear()
+    parser.close()
+    yield from parser.files
+
+def parseFileListXml(xml):
+    if(isinstance(xml, str)): xml = xml.encode('utf8')
+    return list(iterFileList([xml]))
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+
+# Reverse lookup index: phone number -> contact, built from the phonebook downloaded by
+# getcontacts/synccontacts and kept per device in ~/.cache/quicksync4linux/<device serial>/phonebook.json.
+# Numbers are normalised with the area codes of the device (AT^SACO?), so that "+49 30 1234",
+# "0049301234", "030 1234" and (inside area 30) "1234" are found under the same key.
+
+import bisect
+import re
+
+from . import cache
+from . import vcard as vcardlib
+
+
+indexFile = 'phonebook.json'
+
+# international prefix, country code, national prefix, local area code
+defaultAreaCodes = ['00', '', '0', '']
+
+# TEL parameters which are reported as number type
+numberTypes = ['HOME', 'CELL', 'WORK']
+
+def parseAreaCodes(response):
+    # "^SACO: 00,49,0,30"
+    values = [value.strip().strip('"') for value in response.split(':', 1)[-1].split(',')]
+    if(len(values) < 4 or not all(value.isdigit() or value == '' for value in values[:4])):
+        raise ValueError('Invalid area codes: {0}'.format(response))
+    return values[:4]
+
+def normalizeNumber(number, areaCodes=None):
+    # national numbers without national prefix, foreign numbers as "+<country code><number>"
+    international, country, national, area = areaCodes or defaultAreaCodes
+    number = number.replace('(0)', '') # "+49 (0)30 1234"
+    plus = number.strip().startswith('+')
+    digits = re.sub(r'[^\d*#]', '', number)
+    if(not digits): return ''
+    if(plus):
+        full = digits
+    elif(international and digits.startswith(international)):
+        full = digits[len(international):]
+    elif(national and digits.startswith(national)):
+        return digits[len(national):]
+    else:
+        return area+digits # local number
+    if(country and full.startswith(country)):
+        return full[len(country):]
+    return '+'+full
+
+def numberType(params):
+    for param in params:
+        param = param.split('=')[-1]
+        if(param in numberTypes): return param
+    return ''
+
+
+class PhoneBookIndex:
+    def __init__(self, identity, data=None):
+        self.identity = identity
+        data = data or {}
+        self.areaCodes = data.get('areaCodes') or defaultAreaCodes
+        # luid (or "created-<n>" for contacts created with this tool) -> {name, numbers: [[type, number], ...]}
+        self.contacts = data.get('contacts', {})
+        self.built = bool(data)
+        self.numbers = None
+        self.sortedNumbers = None
+
+    @classmethod
+    def load(cls, identity):
+        return cls(identity, cache.load(identity, indexFile))
+
+    def save(self):
+        cache.save(self.identity, indexFile, {'areaCodes': self.areaCodes, 'contacts': self.contacts})
+        self.built = True
+
+    def contactEntry(self, vcard):
+        properties = vcardlib.getProperties(vcard)
+        return {
+            'name': vcardlib.getName(properties),
+            'numbers': [[numberType(params), value] for name, params, value in properties if name == 'TEL' and value],
+        }
+
+    def rebuild(self, vcards, areaCodes=None):
+        # vcards: list of vCard strings as downloaded from the device
+        if(areaCodes): self.areaCodes = areaCodes
+        self.contacts = {}
+        self.numbers = None
+        for vcard in vcards: self.addDownloaded(vcard)
+
+    def addDownloaded(self, vcard):
+        luid = vcardlib.getLuid(vcard)
+        if(luid): self.updateContact(luid, vcard)
+        else: self.addContact(vcard)
+
+    def updateContact(self, luid, vcard):
+        self.contacts[str(luid)] = self.contactEntry(vcard)
+        self.numbers = None
+
+    def addContact(self, vcard):
+        # the device does not tell the luid of a new contact, the next download replaces the entry
+        counter = len(self.contacts)+1
+        while 'created-{0}'.format(counter) in self.contacts: counter += 1
+        self.updateContact('created-{0}'.format(counter), vcard)
+
+    def removeContact(self, luid):
+        self.contacts.pop(str(luid), None)
+        self.numbers = None
+
+    def buildNumbers(self):
+        self.numbers = {}
+        for luid, contact in self.contacts.items():
+            for kind, number in contact['numbers']:
+                key = normalizeNumber(number, self.areaCodes)
+                if(key): self.numbers.setdefault(key, []).append((luid, kind, number))
+        self.sortedNumbers = sorted(self.numbers)
+
+    def result(self, luid, kind, number):
+        return {
+            'device': self.identity, 'luid': None if(luid.startswith('created-')) else luid,
+            'name': self.contacts[luid]['name'], 'type': kind, 'number': number,
+        }
+
+    def lookup(self, number):
+        # contacts with exactly this number, in any notation
+        if(self.numbers is None): self.buildNumbers()
+        key = normalizeNumber(number, self.areaCodes)
+        return [self.result(*match) for match in self.numbers.get(key, [])]
+
+    def lookupPrefix(self, prefix, limit=None):
+        # contacts with a number starting with prefix, e.g. all numbers of a company switchboard
+        if(self.numbers is None): self.buildNumbers()
+        key = normalizeNumber(prefix, self.areaCodes)
+        results = []
+        for position in range(bisect.bisect_left(self.sortedNumbers, key), len(self.sortedNumbers)):
+            if(not self.sortedNumbers[position].startswith(key)): break
+            results += [self.result(*match) for match in self.numbers[self.sortedNumbers[position]]]
+            if(limit and len(results) >= limit): return results[:limit]
+        return results
+
+class IndexSink:
+    # download sink which rebuilds the index vCard by vCard while the phonebook is received,
+    # so that it is never held in memory as a whole
+    def __init__(self, index, areaCodes=None):
+        self.index = index
+        self.areaCodes = areaCodes
+        self.reset()
+
+    def reset(self):
+        # the download starts over
+        self.buffer = bytearray()
+        self.index.rebuild([], self.areaCodes)
+
+    def write(self, data):
+        self.buffer += data
+        end = self.buffer.rfind(b'END:VCARD')
+        if(end >= 0):
+            end += len(b'END:VCARD')
+            text = bytes(memoryview(self.buffer)[:end]).decode('utf8', errors='replace')
+            del self.buffer[:end]
+            for vcard in vcardlib.splitVcards(text): self.index.addDownloaded(vcard)
+        return len(data)
+
+def loadAll():
+    # indexes of all devices which have one
+    return [PhoneBookIndex.load(identity) for identity in cache.identities(indexFile)]
+
+def lookup(number, indexes=None):
+    # number ending with "*" for a prefix search
+    results = []
+    for index in (loadAll() if(indexes is None) else indexes):
+        if(number.endswith('*')): results += index.lookupPrefix(number[:-1])
+        else: results += index.lookup(number)
+    return results
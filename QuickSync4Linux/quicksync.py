@@ -1,26 +1,850 @@
 #!/usr/bin/env python3
 
-from pathlib import Path
-import configparser
+# Modules which are not needed by every action are imported where they are used, so that
+# latency-sensitive calls like `dial` (tel: link handler) start as fast as possible.
+# Check with `python3 -m QuickSync4Linux.benchmark startup` after changing imports.
 
-import serial
+from contextlib import contextmanager
 import time
-import struct
-import argparse
-import datetime
-import re
 import sys
+import os
 
 from . import at
-from . import obex
 from .__init__ import __version__
 
 
+class TransferProgress:
+    def __init__(self, title, stream=sys.stderr, interval=0.2, transfer=None):
+        self.title = title
+        self.transfer = transfer # transfer.TransferController for live packet statistics
+        self.stream = stream
+        self.interval = interval
+        self.done = 0
+        self.total = None
+        self.start = time.monotonic()
+        self.lastOutput = 0
+        self.lastLength = 0
+
+    def update(self, count, total=None):
+        self.done += count
+        if(total): self.total = total
+        now = time.monotonic()
+        finished = self.total is not None and self.done >= self.total
+        if(now - self.lastOutput < self.interval and not finished): return
+        self.lastOutput = now
+
+        elapsed = now - self.start
+        rate = self.done / elapsed if(elapsed > 0) else 0
+        text = '{0}: {1:.1f} KiB'.format(self.title, self.done/1024)
+        if(self.total):
+            text += ' of {0:.1f} KiB ({1}%)'.format(self.total/1024, int(self.done*100/self.total))
+        text += ', {0:.1f} KiB/s'.format(rate/1024)
+        if(self.total and rate and not finished):
+            text += ', ETA {0}s'.format(int((self.total-self.done)/rate))
+        if(self.transfer):
+            text += ' ({0})'.format(self.transfer.summary())
+        print('\r'+text.ljust(self.lastLength), end='\n' if finished else '', file=self.stream, flush=True)
+        self.lastLength = len(text)
+
+
+@contextmanager
+def partialFile(path):
+    # received data goes into "<path>.part" which replaces the file only after the transfer
+    # succeeded; after a failure the old file is untouched and the .part file shows how far it came
+    with open(path+'.part', 'wb') as f:
+        yield f
+    os.replace(path+'.part', path)
+
+def readVcfFile(path):
+    import re
+    with open(path, 'rb') as f:
+        return re.sub(rb'\r?\n', b'\r\n', f.read()) # ensure CRLF line breaks
+
+def createProgress(client, title):
+    # progress output only makes sense for humans watching a terminal
+    if(client.verbose or not sys.stderr.isatty()): return None
+    return TransferProgress(title, transfer=client.transfer)
+
+def querySerial(client):
+    # returns whether the serial number is known, otherwise client.serial is still the device path
+    from . import transport
+    try:
+        client.querySerial()
+        return True
+    except (at.AtException, transport.ReadTimeoutException):
+        return False # fall back to the device path
+
+
+### Obex actions
+
+def checkObexAction(action, options, file):
+    if(action not in obexActions):
+        raise Exception('Unknown action: {0}'.format(action))
+    elif(action == 'createcontacts'):
+        if(file == ''):
+            raise Exception('Please give a .vcf file for import via --file parameter')
+    elif(action == 'editcontact'):
+        if(file == '-' or file == ''):
+            raise Exception('Please give a .vcf file for import via --file parameter')
+        if(not options):
+            raise Exception('Please give the luid of the contact which should be edited')
+    elif(action == 'deletecontact'):
+        if(not options):
+            raise Exception('Please give the luid of the contact which should be edited')
+    elif(action == 'download'):
+        if(not options):
+            raise Exception('Please give the file name of the file which should be downloaded')
+        if(file == '-' or file == ''):
+            raise Exception('Please specify the output file name via --file parameter')
+    elif(action == 'upload'):
+        if(not options):
+            raise Exception('Please give the file name of the file which should be uploaded')
+        if(file == '-' or file == ''):
+            raise Exception('Please specify the input file via --file parameter')
+    elif(action == 'delete'):
+        if(not options):
+            raise Exception('Please give the file name of the file which should be deleted')
+    elif(action == 'mirror'):
+        if(file == '-' or file == '' or not os.path.isdir(file)):
+            raise Exception('Please specify the local media directory via --file parameter')
+        for mode in (options.split(',') if(options) else []):
+            if(mode not in mirrorModes):
+                raise Exception('Unknown mirror mode "{0}", possible modes: {1}'.format(mode, ', '.join(mirrorModes)))
+    elif(action == 'exists'):
+        if(not options):
+            raise Exception('Please give the file name of the file which should be checked')
+    elif(action == 'calllog'):
+        from . import calllog
+        for kind in (options.split(',') if(options) else []):
+            if(kind not in calllog.kinds):
+                raise Exception('Unknown call log "{0}", possible logs: {1}'.format(kind, ', '.join(calllog.kinds)))
+
+def obexInfo(client, options, file):
+    from . import obex
+    for path in [
+        obex.FilePath.InfoLog,
+        obex.FilePath.DevInfo,
+        obex.FilePath.LuidCC,
+        obex.FilePath.Luid0,
+    ]:
+        print()
+        print('===', path)
+        print(client.getObject(path).decode('utf8'))
+
+def getContacts(client, options, file):
+    from .client import TeeSink
+    from . import phonebook
+    from . import obex
+    index = phonebook.PhoneBookIndex.load(client.serial)
+    indexSink = phonebook.IndexSink(index, client.areaCodes) # the reverse lookup index is built while downloading
+    if(file == '-' or file == ''):
+        client.getContacts(sink=TeeSink(sys.stdout.buffer, indexSink))
+        sys.stdout.buffer.write(b'\n')
+        sys.stdout.flush()
+    else:
+        with partialFile(file) as f:
+            client.getContacts(sink=TeeSink(f, indexSink), progress=createProgress(client, obex.FilePath.PhoneBook))
+    index.save()
+
+def openVcfSource(file):
+    # binary file and sha256 of its content, read in chunks; stdin is spooled into a temporary file
+    import hashlib
+    import tempfile
+    digest = hashlib.sha256()
+    if(file == '-'):
+        f = tempfile.SpooledTemporaryFile(max_size=1024*1024)
+        for chunk in iter(lambda: sys.stdin.read(65536), ''):
+            chunk = chunk.encode('utf8')
+            digest.update(chunk)
+            f.write(chunk)
+    else:
+        f = open(file, 'rb')
+        for chunk in iter(lambda: f.read(65536), b''):
+            digest.update(chunk)
+    f.seek(0)
+    return f, digest.hexdigest()
+
+def readAhead(items, count=32):
+    # iterates items in a background thread, so that the next items are prepared while the
+    # caller is waiting for the device; exceptions are raised in the caller
+    import threading
+    import queue
+    buffer = queue.Queue(maxsize=count)
+    done = object()
+    stop = threading.Event()
+    def put(entry):
+        # gives up when the caller stopped iterating
+        while(not stop.is_set()):
+            try:
+                buffer.put(entry, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+    def produce():
+        try:
+            for item in items:
+                if(not put((item, None))): return
+            put((done, None))
+        except Exception as e:
+            put((done, e))
+    thread = threading.Thread(target=produce, daemon=True)
+    thread.start()
+    try:
+        while True:
+            item, error = buffer.get()
+            if(error): raise error
+            if(item is done): return
+            yield item
+    finally:
+        stop.set()
+        thread.join()
+
+def createContacts(client, options, file):
+    from . import vcard as vcardlib
+    from . import cache
+    import io
+    f, source = openVcfSource(file)
+    index = phoneBookIndex(client)
+
+    # remember how many contacts the device acknowledged, so that an interrupted
+    # import of the same file continues with the first contact which is missing
+    state = cache.load(client.serial, 'createcontacts.json', {})
+    acknowledged = state.get('acknowledged', 0) if(state.get('source') == source) else 0
+    if(acknowledged):
+        print('Resuming import at contact #{0}'.format(acknowledged+1))
+
+    # the file is parsed card by card (universal newlines), the next cards are converted
+    # into the vCard 2.1 dialect of the device while the current one is sent
+    lines = io.TextIOWrapper(f, encoding='utf-8-sig', newline=None)
+    vcards = readAhead(vcardlib.encodeVcard(properties) for properties in vcardlib.readVcards(lines))
+    completed = False
+    try:
+        for counter, vcard in enumerate(vcards, 1):
+            if(counter <= acknowledged): continue
+            if(not client.verbose): print('Creating contact #{0}'.format(counter))
+            client.createContact(vcard)
+            acknowledged = counter
+            if(index): index.addContact(vcard.decode('ascii'))
+            # saved after every contact, so that even a killed process (SIGTERM, crash) does not create duplicates
+            cache.save(client.serial, 'createcontacts.json', {'source': source, 'acknowledged': acknowledged})
+        completed = True
+    finally:
+        vcards.close()
+        lines.close()
+        if(index): index.save()
+        if(completed): cache.remove(client.serial, 'createcontacts.json')
+
+def syncContacts(client, options, file):
+    from . import obex
+    from . import cache
+    from . import vcard as vcardlib
+    cached = cache.load(client.serial, 'contacts.json', {})
+    contacts = cached.get('contacts', {})
+    changeCounter = int(client.getObject(obex.FilePath.LuidCC).decode('ascii').strip())
+    updated = deleted = 0
+
+    changeLog = None
+    if(contacts and cached.get('cc') is not None and cached['cc'] != changeCounter):
+        changeLog = obex.parseChangeLog(client.getObject(obex.FilePath.LuidChangeLog.format(cached['cc'])).decode('utf8'))
+        if(changeLog['overflow'] or changeLog.get('did') != cached.get('did')):
+            # the device can not tell us all changes, start over
+            changeLog = None
+            contacts = {}
+
+    if(not contacts):
+        did = obex.parseChangeLog(client.getObject(obex.FilePath.LuidChangeLog.format(changeCounter)).decode('utf8')).get('did')
+        for vcard in vcardlib.splitVcards(client.getContacts().decode('utf8')):
+            contacts[vcardlib.getLuid(vcard)] = vcard
+        updated = len(contacts)
+        mode = 'full'
+    elif(changeLog):
+        did = changeLog.get('did')
+        # only the latest change of every contact matters
+        latestChanges = {luid: kind for kind, cc, luid in sorted(changeLog['changes'], key=lambda change: change[1])}
+        for luid, kind in latestChanges.items():
+            if(kind == 'M'):
+                try:
+                    vcard = vcardlib.splitVcards(client.getObject(obex.FilePath.VCardLuid.format(luid)).decode('utf8'))
+                except obex.ObexException as e:
+                    if(e.code != obex.ReCode.NotFound): raise # the cache is only saved after a complete sync
+                    vcard = None # already deleted again
+                if(vcard):
+                    contacts[luid] = vcard[0]
+                    updated += 1
+                    continue
+            if(contacts.pop(luid, None) is not None): deleted += 1
+        mode = 'incremental'
+    else:
+        did = cached.get('did')
+        mode = 'unchanged'
+
+    cache.save(client.serial, 'contacts.json', {'cc': changeCounter, 'did': did, 'contacts': contacts})
+    rebuildPhoneBookIndex(client, list(contacts.values()))
+    print('{0} contacts ({1} sync, {2} updated, {3} deleted)'.format(len(contacts), mode, updated, deleted), file=sys.stderr)
+
+    vcf = ''.join(
+        contacts[luid]+'\r\n'
+        for luid in sorted(contacts, key=lambda luid: int(luid) if(luid and luid.isdigit()) else 0)
+    )
+    if(file == '-' or file == ''):
+        print(vcf)
+    else:
+        with open(file, 'w') as f:
+            f.write(vcf)
+
+def editContact(client, options, file):
+    vcf = readVcfFile(file)
+    client.editContact(options, vcf)
+    index = phoneBookIndex(client)
+    if(index):
+        index.updateContact(options, vcf.decode('utf8', errors='replace'))
+        index.save()
+
+def deleteContact(client, options, file):
+    client.deleteContact(options)
+    index = phoneBookIndex(client)
+    if(index):
+        index.removeContact(options)
+        index.save()
+
+### reverse lookup index
+# Built from every downloaded phonebook and updated when contacts are changed with this tool,
+# so that `lookup` never needs the device.
+
+# actions which download the whole phonebook and therefore need the area codes of the device
+areaCodeActions = ['getcontacts', 'synccontacts']
+
+def queryAreaCodes(client):
+    from . import phonebook
+    from . import transport
+    try:
+        client.areaCodes = phonebook.parseAreaCodes(client.command(at.Command.GetAreaCodes).decode('ascii'))
+    except (at.AtException, transport.ReadTimeoutException, ValueError):
+        client.areaCodes = None # keep the area codes of the existing index
+
+def phoneBookIndex(client):
+    # the index of the device if there is one, contact changes alone do not make a useful index
+    from . import phonebook
+    index = phonebook.PhoneBookIndex.load(client.serial)
+    return index if(index.built) else None
+
+def rebuildPhoneBookIndex(client, vcards):
+    from . import phonebook
+    index = phonebook.PhoneBookIndex.load(client.serial)
+    index.rebuild(vcards, client.areaCodes)
+    index.save()
+
+def lookup(number):
+    from . import phonebook
+    if(not number):
+        raise Exception('Please give the phone number to look up, or the beginning of the number followed by "*"')
+    results = phonebook.lookup(number)
+    for result in results:
+        print('\t'.join([result['name'], result['type'], result['number'], result['luid'] or '', result['device']]))
+    return 0 if(results) else 1
+
+### directory index
+# The media folder listings and the memory status are stored per device, so that `listfiles`
+# and `exists` can be answered without switching into Obex mode. Uploading or deleting
+# files with this tool invalidates the index.
+
+indexFile = 'index.json'
+
+def readDirectoryIndex(client):
+    from . import cache
+    return cache.load(client.serial, indexFile, {})
+
+def invalidateDirectoryIndex(client):
+    from . import cache
+    cache.remove(client.serial, indexFile)
+
+def updateDirectoryIndex(client, folders, memory=None):
+    from . import cache
+    index = readDirectoryIndex(client)
+    index.setdefault('folders', {})
+    for folder, files in folders.items():
+        index['folders'][folder] = [entry.attributes() for entry in files]
+    if(memory): index['memory'] = list(memory)
+    index['updated'] = time.time()
+    cache.save(client.serial, indexFile, index)
+
+def indexedFolder(index, folder):
+    from . import obex
+    files = index.get('folders', {}).get(folder)
+    if(files is None): return None
+    return [obex.FileEntry.fromAttributes(attributes) for attributes in files]
+
+def printFileList(memory, folders):
+    import datetime
+    totalSpace, freeSpace = memory
+    print('Total Space:', totalSpace/1024, 'KiB')
+    print('Free Space:', freeSpace/1024, 'KiB')
+
+    for folder, files in folders.items():
+        print()
+        print('===', folder)
+        maxLenName = max([len(entry.name) for entry in files], default=0)
+        for entry in files:
+            print(
+                (entry.fileid+':').ljust(4),
+                entry.name.ljust(maxLenName),
+                datetime.datetime.strptime(entry.modified, '%Y%m%dT%H%M%S').strftime('%Y-%m-%d %H:%M'),
+                entry.userPerm,
+                str(round(entry.size/1024, 1)) + ' KiB'
+            )
+
+def listFilesFromIndex(client, options, file):
+    from . import obex
+    if(options == 'refresh'): return False
+    index = readDirectoryIndex(client)
+    folders = {folder: indexedFolder(index, folder) for folder in obex.FolderPath.Media}
+    if(not index.get('memory') or None in folders.values()): return False
+    printFileList(index['memory'], folders)
+    print('(cached listing of {0}, use "listfiles refresh" to read it from the device)'.format(
+        time.strftime('%Y-%m-%d %H:%M', time.localtime(index['updated']))
+    ), file=sys.stderr)
+    return True
+
+def listFiles(client, options, file):
+    from . import obex
+    memory = client.getMemoryStatus()
+    folders = {folder: client.listFolder(folder) for folder in obex.FolderPath.Media}
+    updateDirectoryIndex(client, folders, memory)
+    printFileList(memory, folders)
+
+def checkExists(files, path):
+    if(not any(entry.name == os.path.basename(path) for entry in files)):
+        raise Exception('{0} does not exist on the device'.format(path))
+    print(path)
+
+def existsFromIndex(client, options, file):
+    files = indexedFolder(readDirectoryIndex(client), os.path.dirname(options))
+    if(files is None): return False
+    checkExists(files, options)
+    return True
+
+def exists(client, options, file):
+    folder = os.path.dirname(options)
+    files = client.listFolder(folder)
+    updateDirectoryIndex(client, {folder: files})
+    checkExists(files, options)
+
+def download(client, options, file):
+    with partialFile(file) as f:
+        client.getObject(options, sink=f, progress=createProgress(client, options))
+
+def upload(client, options, file):
+    invalidateDirectoryIndex(client)
+    with open(file, 'rb') as f:
+        client.putFile(options, f, os.fstat(f.fileno()).st_size, progress=createProgress(client, options))
+
+def delete(client, options, file):
+    invalidateDirectoryIndex(client)
+    client.deleteFile(options)
+
+# with --at-upload, pictures up to this size are uploaded in AT mode, where no mode switch is
+# needed; above, the hex encoded AT parts take longer than the Obex mode switches (see
+# `benchmark imageupload`). Opt-in: the AT^DMPU/AT^DMPW parameters are not documented and
+# were only tried with the simulator.
+atImageUploadMax = 8*1024
+
+def uploadImageViaAt(client, options, file):
+    from . import obex
+    from . import transport
+    if(os.path.dirname(options) not in [obex.FolderPath.ScreenSavers, obex.FolderPath.ClipPictures]): return False
+    if(os.path.getsize(file) > atImageUploadMax): return False
+    with open(file, 'rb') as f:
+        data = f.read()
+    invalidateDirectoryIndex(client)
+    try:
+        client.putImage(options, data, progress=createProgress(client, options))
+    except (at.AtException, transport.ReadTimeoutException) as e:
+        if(client.verbose): print('AT picture upload failed, using Obex:', e)
+        return False
+    return True
+
+mirrorModes = ['delete', 'dry-run']
+
+def localFiles(directory):
+    files = {}
+    if(not os.path.isdir(directory)): return files
+    for entry in os.scandir(directory):
+        if(entry.is_file() and not entry.name.startswith('.')):
+            files[entry.name] = entry.stat()
+    return files
+
+# size and modification time of every file uploaded by mirror, per device: the clock of the
+# handset can not be compared with the local one, so the listing only tells whether a file is there
+mirrorFile = 'mirror.json'
+
+def needsUpload(stat, entry, uploaded):
+    # uploaded: [size, mtime in ns] of the local file when it was uploaded, or None
+    if(entry is None): return 'new'
+    if(stat.st_size != entry.size): return 'changed'
+    if(uploaded is None): return 'not uploaded by mirror'
+    if(uploaded != [stat.st_size, stat.st_mtime_ns]): return 'changed'
+    return None
+
+def mirror(client, options, file):
+    # local directory with subdirectories named like the device media folders (Pictures, Clip Pictures, Sounds)
+    from . import cache
+    from . import obex
+    modes = options.split(',') if(options) else []
+    uploads = deletes = unchanged = 0
+    listings = {}
+    uploaded = cache.load(client.serial, mirrorFile, {})
+
+    for folder in obex.FolderPath.Media:
+        directory = os.path.join(file, folder.lstrip('/'))
+        # folders without local directory are left alone, an empty directory deletes all files of the folder
+        if(not os.path.isdir(directory)): continue
+        local = localFiles(directory)
+        if(not local and 'delete' not in modes): continue
+        remote = {entry.name: entry for entry in client.listFolder(folder)}
+        listings[folder] = list(remote.values())
+        records = uploaded.setdefault(folder, {})
+
+        print('===', folder, file=sys.stderr)
+        for name, stat in sorted(local.items()):
+            reason = needsUpload(stat, remote.get(name), records.get(name))
+            if(not reason):
+                unchanged += 1
+                if(client.verbose): print('unchanged', name, file=sys.stderr)
+                continue
+            print('upload', name, '('+reason+', '+str(round(stat.st_size/1024, 1))+' KiB)', file=sys.stderr)
+            uploads += 1
+            if('dry-run' in modes): continue
+            with open(os.path.join(file, folder.lstrip('/'), name), 'rb') as f:
+                client.putFile(folder+'/'+name, f, stat.st_size, progress=createProgress(client, name))
+            records[name] = [stat.st_size, stat.st_mtime_ns]
+            cache.save(client.serial, mirrorFile, uploaded) # an interrupted mirror does not upload it again
+
+        for name, entry in sorted(remote.items()):
+            if(name in local): continue
+            if('delete' not in modes or 'D' not in entry.userPerm):
+                if(client.verbose): print('extra', name, file=sys.stderr)
+                continue
+            print('delete', name, file=sys.stderr)
+            deletes += 1
+            if('dry-run' in modes): continue
+            client.deleteFile(folder+'/'+name)
+            if(records.pop(name, None)): cache.save(client.serial, mirrorFile, uploaded)
+
+    if(uploads or deletes):
+        if('dry-run' not in modes): invalidateDirectoryIndex(client)
+    else:
+        updateDirectoryIndex(client, listings)
+    print('{0}{1} uploaded, {2} deleted, {3} unchanged'.format(
+        'Dry run: ' if 'dry-run' in modes else '', uploads, deletes, unchanged
+    ), file=sys.stderr)
+
+def callLog(client, options, file):
+    # stores the call logs of the device and prints only the calls which were not stored before
+    from . import calllog
+    from . import obex
+    store = calllog.CallLogStore()
+    added = []
+    try:
+        for kind in (options.split(',') if(options) else calllog.kinds):
+            try:
+                data = client.getObject(calllog.kinds[kind])
+            except obex.ObexException as e:
+                if(e.code != obex.ReCode.NotFound): raise
+                print('{0}: not available on this device'.format(kind), file=sys.stderr)
+                continue
+            entries = calllog.parseCallLog(data.decode('utf8', errors='replace'), kind)
+            new = store.add(client.serial, entries)
+            print('{0}: {1} calls, {2} new'.format(kind, len(entries), len(new)), file=sys.stderr)
+            added += new
+    finally:
+        store.close()
+    calllog.writeEntries(sorted(added, key=lambda entry: entry['time'], reverse=True), file)
+
+obexActions = {
+    'obexinfo': obexInfo,
+    'getcontacts': getContacts,
+    'synccontacts': syncContacts,
+    'createcontacts': createContacts,
+    'editcontact': editContact,
+    'deletecontact': deleteContact,
+    'listfiles': listFiles,
+    'exists': exists,
+    'download': download,
+    'upload': upload,
+    'delete': delete,
+    'mirror': mirror,
+    'calllog': callLog,
+}
+
+# actions which store data per device and therefore need to know the device serial
+serialActions = [
+    'getcontacts', 'synccontacts', 'createcontacts', 'editcontact', 'deletecontact',
+    'listfiles', 'exists', 'upload', 'delete', 'mirror', 'calllog',
+]
+
+# actions which may be answered from local data before switching into Obex mode
+indexActions = {
+    'listfiles': listFilesFromIndex,
+    'exists': existsFromIndex,
+}
+
+# actions which may be done in AT mode before switching into Obex mode
+atActions = {
+    'upload': uploadImageViaAt,
+}
+
+
+### batch mode
+
+def readBatchOperations(file):
+    # one operation per line, e.g. `upload "/Sounds/Ring.L22" --file Ring.g722`; '#' starts a comment
+    import argparse
+    import shlex
+    if(file == '-' or file == ''):
+        lines = sys.stdin.read().splitlines()
+    else:
+        with open(file, 'r') as f:
+            lines = f.read().splitlines()
+
+    operations = []
+    for lineNumber, line in enumerate(lines, 1):
+        tokens = shlex.split(line, comments=True)
+        if(not tokens): continue
+        op = argparse.Namespace(action=tokens.pop(0), options=None, file='-')
+        try:
+            while tokens:
+                token = tokens.pop(0)
+                if(token in ['-f', '--file'] and tokens):
+                    op.file = tokens.pop(0)
+                elif(token.startswith('--file=')):
+                    op.file = at.removePrefix(token, '--file=')
+                elif(op.options is None):
+                    op.options = token
+                else:
+                    raise Exception('unexpected argument "{0}"'.format(token))
+            checkObexAction(op.action, op.options, op.file)
+        except Exception as e:
+            raise Exception('Invalid batch operation in line {0}: {1}'.format(lineNumber, e))
+        operations.append(op)
+    return operations
+
+def batch(client, operations):
+    failed = 0
+    for counter, op in enumerate(operations, 1):
+        title = ' '.join(filter(None, [op.action, op.options]))
+        try:
+            obexActions[op.action](client, op.options, op.file)
+            print('[{0}/{1}] {2}: OK'.format(counter, len(operations), title), file=sys.stderr)
+        except Exception as e:
+            failed += 1
+            print('[{0}/{1}] {2}: ERROR: {3}'.format(counter, len(operations), title, e), file=sys.stderr)
+    print('{0} of {1} operations succeeded'.format(len(operations)-failed, len(operations)), file=sys.stderr)
+    return failed
+
+
+### delay calibration
+
+# delays which can be tuned per device model by the "calibrate" action
+calibratedDelays = ['AfterEnterObex', 'AfterExitObex', 'ObexBoundary']
+
+def loadDeviceProfile(client, configParser):
+    if(client.profileLoaded): return
+    client.profileLoaded = True
+    # only ask the device for its identity if there are calibrated profiles at all
+    if(not any(section.startswith('model ') for section in configParser.sections())): return
+    try:
+        section = client.queryDeviceModel()
+    except Exception:
+        return
+    if(not configParser.has_section(section)): return
+    for name in calibratedDelays:
+        if(configParser.has_option(section, name)):
+            setattr(client.delay, name, configParser.getfloat(section, name))
+    if(client.verbose): print('Using delay profile:', section)
+
+def recoverAtMode(client, delays):
+    # bring the device back into a clean AT mode using known-good delays
+    time.sleep(delays['ObexBoundary'])
+    client.ser.write(at.formatCommand(at.Command.ExitObex))
+    time.sleep(delays['ObexBoundary'] + delays['AfterExitObex'])
+    client.ser.write(b'\r\n')
+    time.sleep(client.delay.TimeoutRead)
+    client.ser.reset_input_buffer()
+    client.command(at.Command.Reset)
+
+def probeObexCycle(client, rounds, delays):
+    try:
+        for i in range(rounds):
+            client.enterObex()
+            client.getMemoryStatus()
+            client.exitObex()
+            client.command(at.Command.Ping)
+        return True
+    except Exception as e:
+        if(client.verbose): print('Probe failed:', e)
+        recoverAtMode(client, delays)
+        return False
+
+def calibrate(client, options, configParser, configPath):
+    rounds = int(options) if(options) else 3
+    resolution = 0.05
+    margin = 1.25
+    defaults = {name: getattr(client.delay, name) for name in calibratedDelays}
+
+    retries = client.retries
+    client.retries = 0 # every error counts, a retry would hide a too short delay
+    try:
+        section = client.queryDeviceModel()
+        print('Calibrating', section)
+        if(not probeObexCycle(client, rounds, defaults)):
+            raise Exception('Device does not work reliably even with the default delays')
+
+        # binary search for every delay on its own, keeping the others at their safe defaults
+        results = {}
+        for name in calibratedDelays:
+            low, high = 0.0, defaults[name]
+            while(high - low > resolution):
+                candidate = round((low + high) / 2, 3)
+                setattr(client.delay, name, candidate)
+                stable = probeObexCycle(client, rounds, defaults)
+                print('{0} = {1:.3f}s: {2}'.format(name, candidate, 'stable' if stable else 'unstable'))
+                if(stable): high = candidate
+                else: low = candidate
+            results[name] = min(defaults[name], round(high * margin + resolution, 3))
+            setattr(client.delay, name, defaults[name])
+
+        # verify the combination before storing it
+        for name, value in results.items():
+            setattr(client.delay, name, value)
+        if(not probeObexCycle(client, rounds * 2, defaults)):
+            for name, value in defaults.items():
+                setattr(client.delay, name, value)
+            raise Exception('Calibrated delays are not stable in combination, profile not saved')
+    finally:
+        client.retries = retries
+
+    if(not configParser.has_section(section)): configParser.add_section(section)
+    for name, value in results.items():
+        configParser.set(section, name, str(value))
+        print(name+':', value, 's')
+    os.makedirs(os.path.dirname(configPath), exist_ok=True)
+    with open(configPath, 'w') as f:
+        configParser.write(f)
+    print('Profile saved to', configPath)
+
+
+### link test
+
+linkRates = [9600, 19200, 38400, 57600, 115200, 230400, 460800, 921600]
+
+def deviceBaud(configParser, device, default):
+    # the rate which "linktest" found for this device, if any
+    return configParser.get('device '+device, 'baud', fallback=default)
+
+def linkReference(client):
+    # the object downloaded at every rate: the largest media file up to 256 KiB, or the phonebook
+    from . import obex
+    reference, size = obex.FilePath.PhoneBook, 0
+    for folder in obex.FolderPath.Media:
+        for entry in client.listFolder(folder):
+            if(size < entry.size <= 256*1024):
+                reference, size = folder+'/'+entry.name, entry.size
+    return reference
+
+def probeLink(client, rate, reference, checksum, pings, transfers, delays):
+    import statistics
+    import hashlib
+    result = {'rate': rate, 'attempts': 0, 'errors': 0, 'latency': None, 'throughput': None}
+    client.ser.baudrate = rate
+    client.ser.reset_input_buffer()
+
+    latencies = []
+    for i in range(pings):
+        result['attempts'] += 1
+        start = time.monotonic()
+        try:
+            client.command(at.Command.Ping)
+            latencies.append(time.monotonic() - start)
+        except Exception as e:
+            if(client.verbose): print('Ping failed:', e)
+            result['errors'] += 1
+            client.ser.reset_input_buffer()
+    if(not latencies): return result # the device does not understand us at this rate
+    result['latency'] = statistics.median(latencies)
+
+    transferred = duration = 0
+    try:
+        with client.obexSession():
+            for i in range(transfers):
+                result['attempts'] += 1
+                start = time.monotonic()
+                data = client.getObject(reference)
+                duration += time.monotonic() - start
+                if(hashlib.sha256(data).hexdigest() == checksum): transferred += len(data)
+                else: result['errors'] += 1
+    except Exception as e:
+        if(client.verbose): print('Transfer failed:', e)
+        result['errors'] += 1
+        recoverAtMode(client, delays)
+    if(transferred): result['throughput'] = transferred / duration
+    return result
+
+def linktest(client, options, configParser, configPath):
+    import hashlib
+    rates = [int(rate) for rate in options.split(',')] if(options) else linkRates
+    pings, transfers = 5, 2
+    delays = {name: getattr(client.delay, name) for name in calibratedDelays}
+    original = client.ser.baudrate
+    retries = client.retries
+    client.retries = 0 # every error counts
+
+    with client.obexSession():
+        reference = linkReference(client)
+        data = client.getObject(reference)
+    checksum = hashlib.sha256(data).hexdigest()
+    print('Transferring {0} ({1} KiB) at {2} rates'.format(reference, round(len(data)/1024, 1), len(rates)))
+
+    results = []
+    try:
+        for rate in rates:
+            result = probeLink(client, rate, reference, checksum, pings, transfers, delays)
+            results.append(result)
+            print('{0:>7} baud: ping {1}, {2}, {3} errors in {4} attempts'.format(
+                rate,
+                '{0:.1f} ms'.format(result['latency']*1000) if(result['latency'] is not None) else '-',
+                '{0:.1f} KiB/s'.format(result['throughput']/1024) if(result['throughput']) else '-',
+                result['errors'], result['attempts'],
+            ))
+    finally:
+        client.ser.baudrate = original
+        client.retries = retries
+
+    stable = [result for result in results if result['throughput'] and not result['errors']]
+    if(not stable):
+        raise Exception('No baud rate worked without errors, config not changed')
+    # rates within 5% of the fastest make no difference (e.g. USB, where the rate is ignored), take the lowest of them
+    fastest = max(result['throughput'] for result in stable)
+    best = min([result for result in stable if result['throughput'] >= fastest * 0.95], key=lambda result: result['rate'])
+
+    section = 'device '+client.device
+    if(not configParser.has_section(section)): configParser.add_section(section)
+    configParser.set(section, 'baud', str(best['rate']))
+    os.makedirs(os.path.dirname(configPath), exist_ok=True)
+    with open(configPath, 'w') as f:
+        configParser.write(f)
+    print('Best stable rate {0} baud saved to {1}, used for {2} from now on'.format(best['rate'], configPath, client.device))
+
+
 def main():
+    import configparser
+    import argparse
+
     # read config
     config = {}
+    configPath = os.path.expanduser('~')+'/.config/quicksync4linux.ini'
     configParser = configparser.ConfigParser()
-    configParser.read(str(Path.home())+'/.config/quicksync4linux.ini')
+    configParser.read(configPath)
     if(configParser.has_section('general')): config = dict(configParser.items('general'))
 
     # parse arguments
@@ -29,428 +853,196 @@ def main():
         description='Communicate with Gigaset devices',
         epilog=f'Version {__version__}, (c) Georg Sieber 2023-2024. If you like this program please consider making a donation using the sponsor button on GitHub (https://github.com/schorschii/QuickSync4Linux) to support the development. It depends on users like you if this software gets further updates.'
     )
-    parser.add_argument('action', help='one of: info, obexinfo, dial, getcontacts, createcontact, editcontact, deletecontact, listfiles, upload, download, delete')
+    parser.add_argument('action', help='one of: info, obexinfo, dial, getcontacts, createcontact, editcontact, deletecontact, synccontacts, lookup, listfiles, exists, upload, download, delete, mirror, calllog, batch, calibrate, linktest')
     parser.add_argument('options', nargs='?', help='e.g. a phone number for the "dial" action, a luid for contact operations or a file name on device for file actions')
     parser.add_argument('-d', '--device', default=config.get('device', '/dev/ttyACM0'), help='serial port device')
-    parser.add_argument('-b', '--baud', default=config.get('baud', 9600))
+    parser.add_argument('-b', '--baud', default=None, help='serial port speed, default: the rate found by "linktest" for the device, or 9600')
     parser.add_argument('-f', '--file', default='-', help='file to read from or write into, stdout/stdin default')
     parser.add_argument('-v', '--verbose', action='count', default=0, help='print complete AT/Obex serial communication')
+    parser.add_argument('--no-daemon', action='store_true', help='always use the serial port directly, even if quicksyncd is running')
+    parser.add_argument('--timing', action='store_true', help='print a table with the time spent per command when finished')
+    parser.add_argument('--trace', help='write the timing of every command into this file, as JSON lines if it ends with .jsonl, otherwise as Chrome trace')
+    parser.add_argument('--record', help='write all bytes sent to and received from the device into this file')
+    parser.add_argument('--replay', help='play a file written by --record back instead of using the device')
+    parser.add_argument('--fast', action='store_true', help='replay as fast as possible instead of with the original timing')
+    parser.add_argument('--at-upload', action='store_true', default=config.get('at-upload') in ['1', 'yes', 'true'], help='experimental: upload small pictures in AT mode (AT^DMPU/AT^DMPW) instead of Obex, not verified on real devices yet')
+    parser.add_argument('--no-adaptive', action='store_true', help='always use the negotiated Obex packet size without pauses, even on a lossy link')
+    parser.add_argument('--no-srm', action='store_true', help='do not offer Obex Single Response Mode, wait for an answer to every packet')
+    parser.add_argument('--retries', type=int, default=3, help='how often a packet or an Obex operation is repeated after the device was busy or did not respond')
     args = parser.parse_args()
 
-    # open serial port
-    ser = serial.Serial(
-        args.device,
-        args.baud,
-        write_timeout=at.Delay.TimeoutWrite
-    )
-    if(args.verbose): print('Connected to:', ser.name)
-
-    def readVcfFile(path):
-        vcf = open(path, 'rb').read()
-        return vcf.replace(b'\r\n', b'\n').replace(b'\n', b'\r\n') # ensure CRLF line breaks
-
-    def sendAndReadResponse(data, wait=None, isObex=False):
-        if(args.verbose):
-            print()
-            print('=== SEND ===')
-            if(args.verbose >= 2): print(data.hex())
-            print(data.decode('ascii', errors='backslashreplace'))
-        ser.write(data)
-
-        if(args.verbose):
-            print()
-            print('=== RECEIVE ===')
-        results = []
-        buf = b''
-        while True:
-            defaultDelay = at.Delay.AfterInvoke if(not isObex) else 0
-            time.sleep(wait if(wait) else defaultDelay)
+    # answered from the local index only, the device is not needed
+    if(args.action == 'lookup'):
+        exit(lookup(args.options))
 
-            if(ser.in_waiting == 0 and not wait): continue
-
-            tmp = ser.read(ser.in_waiting)
-            buf += tmp
-            if(args.verbose):
-                if(args.verbose >= 2): print(tmp.hex())
-                print(tmp.decode('ascii', errors='backslashreplace'), end='')
-
-            if(isObex): # obex command result handling
-                try:
-                    if(obex.evaluateResponse(buf, results, ser, isObex==obex.QuickSyncOperation.Upload)):
-                        return b''.join(results)
-                    else:
-                        buf = b''
-                except obex.InvalidObexLengthException:
-                    # incomplete transmission, read more bytes from serial port
-                    continue
+    recorder = None
+    if(args.timing or args.trace):
+        from .timing import TimingRecorder
+        recorder = TimingRecorder()
 
-            else: # AT command result handling
-                try:
-                    return at.evaluateResponse(buf, data)
-                except at.IncompleteAtResponseException:
-                    # incomplete transmission, read more bytes from serial port
-                    continue
+    # forward the request to a running quicksyncd which owns the serial port
+    from . import daemon
+    socketPath = config.get('socket', daemon.defaultSocketPath())
+    if(not args.no_daemon and not args.record and not args.replay and os.path.exists(socketPath)):
+        try:
+            try:
+                exit(daemon.forward(socketPath, args, recorder))
+            finally:
+                if(recorder and recorder.timings): reportTiming(recorder, args)
+        except ConnectionError:
+            pass # daemon not running anymore, use the serial port directly
 
+    if(args.baud is None): args.baud = deviceBaud(configParser, args.device, config.get('baud', 9600))
 
-    if(args.action == 'info'):
-        for title, command in {
-            'Manufacturer': at.Command.GetManufacturer,
-            'Type': at.Command.GetDeviceType,
-            'Product': at.Command.GetProductName,
-            'Serial (IPUI)': at.Command.GetSerialNumber,
-            'Internal Name': at.Command.GetInternalName,
-            'Battery State': at.Command.GetBatteryState,
-            'Signal State': at.Command.GetSignalState,
-            'Firmware': at.Command.GetFirmwareVersion,
-            'Firmware URL': at.Command.GetFirmwareUrl,
-            'Melodies': at.Command.ListMelodies,
-            'Area Codes': at.Command.GetAreaCodes,
-            'Hardware Connection State': at.Command.GetHardwareConnectionState,
-            'Supported Features': at.Command.GetSupportedFeatures,
-            'Supported Multimedia': at.Command.GetSupportedMultimedia,
-            'Screen Size Clip': at.Command.GetScreenSizeClip,
-            'Screen Size Full': at.Command.GetScreenSizeFull,
-            'Extended Modes List': at.Command.GetExtendedModesList,
-            'Current Extended Mode': at.Command.GetCurrentExtendedMode,
-        }.items():
+    # open serial port
+    from .client import QuickSyncClient
+    client = QuickSyncClient(args.device, args.baud, verbose=args.verbose, ser=openReplay(args)).open()
+    client.timing = recorder
+    client.retries = args.retries
+    client.singleResponseMode = not args.no_srm
+    client.adaptiveTransfer = not args.no_adaptive
+    if(args.replay and args.fast):
+        for name in ['AfterInvoke', 'AfterEnterObex', 'AfterExitObex', 'ObexBoundary', 'RetryBackoff']:
+            setattr(client.delay, name, 0)
+    if(args.record):
+        from .recording import RecordingSerial
+        client.ser = RecordingSerial(client.ser, args.record, {
+            'device': args.device, 'baud': args.baud, 'action': args.action, 'options': args.options, 'file': args.file
+        })
+    try:
+        exit(runAction(client, args, configParser, configPath))
+    finally:
+        if(recorder): reportTiming(recorder, args)
+        if(args.replay and client.ser.remaining()):
+            print('Replay finished with {0} unused events in the recording'.format(client.ser.remaining()), file=sys.stderr)
+        client.close()
+
+def openReplay(args):
+    if(not args.replay): return None
+    from .recording import ReplaySerial
+    ser = ReplaySerial(args.replay, realtime=not args.fast)
+    if((ser.header.get('action'), ser.header.get('options')) != (args.action, args.options)):
+        print('Warning: recording was made with "{0} {1}"'.format(ser.header.get('action'), ser.header.get('options') or ''), file=sys.stderr)
+    return ser
+
+def reportTiming(recorder, args):
+    if(args.trace):
+        recorder.write(args.trace)
+    if(args.timing):
+        print(file=sys.stderr)
+        print(recorder.summary(), file=sys.stderr)
+
+
+# title, command and whether the answer never changes for a handset firmware
+# (static answers are cached per device and firmware version)
+infoCommands = [
+    ('Manufacturer', at.Command.GetManufacturer, True),
+    ('Type', at.Command.GetDeviceType, True),
+    ('Product', at.Command.GetProductName, True),
+    ('Serial (IPUI)', at.Command.GetSerialNumber, True),
+    ('Internal Name', at.Command.GetInternalName, False),
+    ('Battery State', at.Command.GetBatteryState, False),
+    ('Signal State', at.Command.GetSignalState, False),
+    ('Firmware', at.Command.GetFirmwareVersion, False),
+    ('Firmware URL', at.Command.GetFirmwareUrl, False),
+    ('Melodies', at.Command.ListMelodies, True),
+    ('Area Codes', at.Command.GetAreaCodes, False),
+    ('Hardware Connection State', at.Command.GetHardwareConnectionState, False),
+    ('Supported Features', at.Command.GetSupportedFeatures, True),
+    ('Supported Multimedia', at.Command.GetSupportedMultimedia, True),
+    ('Screen Size Clip', at.Command.GetScreenSizeClip, True),
+    ('Screen Size Full', at.Command.GetScreenSizeFull, True),
+    ('Extended Modes List', at.Command.GetExtendedModesList, True),
+    ('Current Extended Mode', at.Command.GetCurrentExtendedMode, False),
+]
+
+def deviceProfile(client, refresh=False):
+    # static answers of the device by title (e.g. profile['Screen Size Full']) plus the current firmware,
+    # only answers missing in the cache are queried
+    from . import cache
+    try:
+        firmware = client.command(at.Command.GetFirmwareVersion).decode('ascii')
+    except Exception:
+        firmware = None
+    # without serial number or firmware version the cache can not be assigned reliably
+    cached = querySerial(client) and firmware is not None
+    profile = {} if(refresh or not cached) else cache.load(client.serial, 'profile.json', {})
+    if(profile.get('Firmware') != firmware):
+        profile = {} # a firmware update may change the features
+    missing = [(title, command) for title, command, static in infoCommands if static and title not in profile]
+    for title, command in missing:
+        try:
+            profile[title] = client.command(command).decode('ascii')
+        except Exception:
+            pass # not supported by this device, ask again next time
+    if(firmware is not None): profile['Firmware'] = firmware
+    if(missing and cached): cache.save(client.serial, 'profile.json', profile)
+    return profile
+
+def info(client, options=None):
+    profile = deviceProfile(client, refresh=(options == 'refresh'))
+    for title, command, static in infoCommands:
+        if(title in profile):
+            response = profile[title]
+        else:
             try:
-                response = sendAndReadResponse(at.formatCommand(command)).decode('ascii')
+                response = client.command(command).decode('ascii')
             except Exception as e:
                 response = '['+'ERROR: '+str(e)+']'
-            print(title+':', response)
-
-
-    elif(args.action == 'obexinfo'):
-        sendAndReadResponse(at.formatCommand(at.Command.EnterObex), wait=at.Delay.AfterEnterObex)
-        sendAndReadResponse(
-            obex.compileConnect(obex.compileMessage(obex.Header.Target, obex.ServiceUuid.DesSync)),
-            isObex=True
-        )
-
-        print()
-        print('===', obex.FilePath.InfoLog)
-        print(sendAndReadResponse(
-            obex.compileMessage(
-                obex.OpCode.Get+obex.Mask.Final,
-                obex.compileNameHeader( obex.FilePath.InfoLog )
-            ),
-            isObex=True
-        ).decode('utf8'))
+        print(title+':', response)
 
-        print()
-        print('===', obex.FilePath.DevInfo)
-        print(sendAndReadResponse(
-            obex.compileMessage(
-                obex.OpCode.Get+obex.Mask.Final,
-                obex.compileNameHeader( obex.FilePath.DevInfo )
-            ),
-            isObex=True
-        ).decode('utf8'))
-
-        print()
-        print('===', obex.FilePath.LuidCC)
-        print(sendAndReadResponse(
-            obex.compileMessage(
-                obex.OpCode.Get+obex.Mask.Final,
-                obex.compileNameHeader( obex.FilePath.LuidCC )
-            ),
-            isObex=True
-        ).decode('utf8'))
-
-        print()
-        print('===', obex.FilePath.Luid0)
-        print(sendAndReadResponse(
-            obex.compileMessage(
-                obex.OpCode.Get+obex.Mask.Final,
-                obex.compileNameHeader( obex.FilePath.Luid0 )
-            ),
-            isObex=True
-        ).decode('utf8'))
-
-        time.sleep(at.Delay.ObexBoundary)
-        sendAndReadResponse(at.formatCommand(at.Command.ExitObex), wait=at.Delay.ObexBoundary)
-        time.sleep(at.Delay.AfterExitObex)
-        sendAndReadResponse(at.formatCommand(at.Command.Reset), wait=at.Delay.AfterExitObex)
+def runAction(client, args, configParser, configPath):
+    # executes one action on an opened client, returns the exit code
+    if(args.action == 'info'):
+        info(client, args.options)
 
 
     elif(args.action == 'dial'):
         if(not args.options):
             raise Exception('Please tell me a number to call')
 
-        sendAndReadResponse(at.formatCommand(at.Command.Dial, args.options), wait=0)
-
-
-    elif(args.action == 'getcontacts'):
-        sendAndReadResponse(at.formatCommand(at.Command.EnterObex), wait=at.Delay.AfterEnterObex)
-        sendAndReadResponse(
-            obex.compileConnect(obex.compileMessage(obex.Header.Target, obex.ServiceUuid.DesSync)),
-            isObex=True
-        )
-
-        vcf = sendAndReadResponse(
-            obex.compileMessage(
-                obex.OpCode.Get+obex.Mask.Final,
-                obex.compileNameHeader( obex.FilePath.PhoneBook )
-            ),
-            isObex=True
-        ).decode('utf8')
-        if(args.file == '-' or args.file == ''):
-            print(vcf)
-        else:
-            with open(args.file, 'w') as f:
-                f.write(vcf)
+        client.dial(args.options)
 
-        time.sleep(at.Delay.ObexBoundary)
-        sendAndReadResponse(at.formatCommand(at.Command.ExitObex), wait=at.Delay.ObexBoundary)
-        time.sleep(at.Delay.AfterExitObex)
-        sendAndReadResponse(at.formatCommand(at.Command.Reset), wait=at.Delay.AfterExitObex)
 
+    elif(args.action == 'calibrate'):
+        calibrate(client, args.options, configParser, configPath)
 
-    elif(args.action == 'createcontacts'):
-        if(args.file == ''):
-            raise Exception('Please give a .vcf file for import via --file parameter')
-        elif(args.file == '-'):
-            vcf = sys.stdin.read()
-        else:
-            vcf = readVcfFile(args.file).decode('utf8')
-
-        sendAndReadResponse(at.formatCommand(at.Command.EnterObex), wait=at.Delay.AfterEnterObex)
-        sendAndReadResponse(
-            obex.compileConnect(obex.compileMessage(obex.Header.Target, obex.ServiceUuid.DesSync)),
-            isObex=True
-        )
-
-        counter = 1
-        for vcard in re.findall(r"BEGIN\:VCARD[\S\s]*?END\:VCARD", vcf):
-            if(not args.verbose): print('Creating contact #{0}'.format(counter))
-            vcardBytes = vcard.encode('ascii')
-            sendAndReadResponse(
-                obex.compileMessage(
-                    obex.OpCode.Put+obex.Mask.Final,
-                    obex.compileNameHeader( obex.FilePath.NewVCardGQS )
-                    + obex.compileLengthHeader( len(vcardBytes) )
-                    + obex.compileMessage( obex.Header.EndOfBody, vcardBytes )
-                ),
-                isObex=True
-            )
-            counter += 1
 
-        time.sleep(at.Delay.ObexBoundary)
-        sendAndReadResponse(at.formatCommand(at.Command.ExitObex), wait=at.Delay.ObexBoundary)
-        time.sleep(at.Delay.AfterExitObex)
-        sendAndReadResponse(at.formatCommand(at.Command.Reset), wait=at.Delay.AfterExitObex)
+    elif(args.action == 'linktest'):
+        linktest(client, args.options, configParser, configPath)
 
 
-    elif(args.action == 'editcontact'):
-        if(args.file == '-' or args.file == ''):
-            raise Exception('Please give a .vcf file for import via --file parameter')
-        if(not args.options):
-            raise Exception('Please give the luid of the contact which should be edited')
-        vcf = readVcfFile(args.file)
-
-        sendAndReadResponse(at.formatCommand(at.Command.EnterObex), wait=at.Delay.AfterEnterObex)
-        sendAndReadResponse(
-            obex.compileConnect(obex.compileMessage(obex.Header.Target, obex.ServiceUuid.DesSync)),
-            isObex=True
-        )
-
-        sendAndReadResponse(
-            obex.compileMessage(
-                obex.OpCode.Put+obex.Mask.Final,
-                obex.compileNameHeader( obex.FilePath.VCardLuid.format(args.options) )
-                + obex.compileLengthHeader( len(vcf) )
-                + obex.compileMessage( obex.Header.EndOfBody, vcf )
-            ),
-            isObex=True
-        )
-
-        time.sleep(at.Delay.ObexBoundary)
-        sendAndReadResponse(at.formatCommand(at.Command.ExitObex), wait=at.Delay.ObexBoundary)
-        time.sleep(at.Delay.AfterExitObex)
-        sendAndReadResponse(at.formatCommand(at.Command.Reset), wait=at.Delay.AfterExitObex)
-
-
-    elif(args.action == 'deletecontact'):
-        if(not args.options):
-            raise Exception('Please give the luid of the contact which should be edited')
-
-        sendAndReadResponse(at.formatCommand(at.Command.EnterObex), wait=at.Delay.AfterEnterObex)
-        sendAndReadResponse(
-            obex.compileConnect(obex.compileMessage(obex.Header.Target, obex.ServiceUuid.DesSync)),
-            isObex=True
-        )
-
-        sendAndReadResponse(
-            obex.compileMessage(
-                obex.OpCode.Put+obex.Mask.Final,
-                obex.compileNameHeader( obex.FilePath.VCardLuid.format(args.options) )
-            ),
-            isObex=True
-        )
-
-        time.sleep(at.Delay.ObexBoundary)
-        sendAndReadResponse(at.formatCommand(at.Command.ExitObex), wait=at.Delay.ObexBoundary)
-        time.sleep(at.Delay.AfterExitObex)
-        sendAndReadResponse(at.formatCommand(at.Command.Reset), wait=at.Delay.AfterExitObex)
-
-
-    elif(args.action == 'listfiles'):
-        sendAndReadResponse(at.formatCommand(at.Command.EnterObex), wait=at.Delay.AfterEnterObex)
-        sendAndReadResponse(
-            obex.compileConnect(obex.compileMessage(obex.Header.Target, obex.ServiceUuid.DesSync)),
-            isObex=True
-        )
-
-        totalSpaceResponseBytes = sendAndReadResponse(
-            obex.compileMessage(
-                obex.OpCode.Get+obex.Mask.Final,
-                obex.compileMessage( obex.Header.AppParameters, obex.AppParametersCommand.MemoryStatusTotal )
-            ),
-            isObex=True
-        )
-        freeSpaceResponseBytes = sendAndReadResponse(
-            obex.compileMessage(
-                obex.OpCode.Get+obex.Mask.Final,
-                obex.compileMessage( obex.Header.AppParameters, obex.AppParametersCommand.MemoryStatusFree )
-            ),
-            isObex=True
-        )
-        print('Total Space:', obex.parseMemoryResponse(totalSpaceResponseBytes)/1024, 'KiB')
-        print('Free Space:', obex.parseMemoryResponse(freeSpaceResponseBytes)/1024, 'KiB')
-
-        for folder in [
-            obex.FolderPath.ScreenSavers,
-            obex.FolderPath.ClipPictures,
-            obex.FolderPath.Ringtones,
-        ]:
-            print()
-            print('===', folder)
-            sendAndReadResponse(
-                obex.compileMessage(
-                    obex.OpCode.SetPath,
-                    struct.pack('B', obex.SetPathFlags.DontCreate)
-                    + struct.pack('B', obex.SetPathFlags.Constants)
-                    + obex.compileNameHeader( folder )
-                ),
-                isObex=True
-            )
-            fileList = sendAndReadResponse(
-                obex.compileMessage(
-                    obex.OpCode.Get+obex.Mask.Final,
-                    obex.compileMessage( obex.Header.Type, obex.ObjectMimeType.FolderListing )
-                ),
-                isObex=True
-            ).decode('utf8')
-            files, maxLenName = obex.parseFileListXml(''.join(fileList))
-            for file in files:
-                print(
-                    (file['fileid']+':').ljust(4),
-                    file['name'].ljust(maxLenName),
-                    datetime.datetime.strptime(file['modified'], '%Y%m%dT%H%M%S').strftime('%Y-%m-%d %H:%M'),
-                    file['user-perm'],
-                    str(round(int(file['size'])/1024, 1)) + ' KiB'
-                )
-
-        time.sleep(at.Delay.ObexBoundary)
-        sendAndReadResponse(at.formatCommand(at.Command.ExitObex), wait=at.Delay.ObexBoundary)
-        time.sleep(at.Delay.AfterExitObex)
-        sendAndReadResponse(at.formatCommand(at.Command.Reset), wait=at.Delay.AfterExitObex)
-
-
-    elif(args.action == 'download'):
-        if(not args.options):
-            raise Exception('Please give the file name of the file which should be downloaded')
-        if(args.file == '-' or args.file == ''):
-            raise Exception('Please specify the output file name via --file parameter')
+    elif(args.action == 'batch'):
+        operations = readBatchOperations(args.file)
 
-        sendAndReadResponse(at.formatCommand(at.Command.EnterObex), wait=at.Delay.AfterEnterObex)
-        sendAndReadResponse(
-            obex.compileConnect(obex.compileMessage(obex.Header.Target, obex.ServiceUuid.DesSync)),
-            isObex=True
-        )
-
-        fileContent = sendAndReadResponse(
-            obex.compileMessage(
-                obex.OpCode.Get+obex.Mask.Final,
-                obex.compileNameHeader( args.options )
-            ),
-            isObex=True
-        )
-        with open(args.file, 'wb') as f:
-            f.write(fileContent)
-
-        time.sleep(at.Delay.ObexBoundary)
-        sendAndReadResponse(at.formatCommand(at.Command.ExitObex), wait=at.Delay.ObexBoundary)
-        time.sleep(at.Delay.AfterExitObex)
-        sendAndReadResponse(at.formatCommand(at.Command.Reset), wait=at.Delay.AfterExitObex)
-
-
-    elif(args.action == 'upload'):
-        if(not args.options):
-            raise Exception('Please give the file name of the file which should be uploaded')
-        if(args.file == '-' or args.file == ''):
-            raise Exception('Please specify the input file via --file parameter')
+        loadDeviceProfile(client, configParser)
+        if(any(op.action in serialActions for op in operations)): querySerial(client)
+        if(any(op.action in areaCodeActions for op in operations)): queryAreaCodes(client)
+        with client.obexSession():
+            failed = batch(client, operations)
 
-        sendAndReadResponse(at.formatCommand(at.Command.EnterObex), wait=at.Delay.AfterEnterObex)
-        sendAndReadResponse(
-            obex.compileConnect(obex.compileMessage(obex.Header.Target, obex.ServiceUuid.DesSync)),
-            isObex=True
-        )
-
-        with open(args.file, 'rb') as f:
-            data = f.read()
-            chunkSize = 958
-            counter = 0
-            chunks = [data[i:i+chunkSize] for i in range(0, len(data), chunkSize)]
-            for chunk in chunks:
-                finalFlag = obex.Mask.Final if(counter == len(chunks)-1) else 0
-                bodyHeader = obex.Header.EndOfBody if(counter == len(chunks)-1) else obex.Header.Body
-                nameHeader = obex.compileNameHeader(args.options) if(counter == 0) else b''
-                lengthHeader = obex.compileLengthHeader(len(data)) if(counter == 0) else b''
-                sendAndReadResponse(
-                    obex.compileMessage(
-                        obex.OpCode.Put+finalFlag,
-                        nameHeader
-                        + lengthHeader
-                        + obex.compileMessage( bodyHeader, chunk )
-                    ),
-                    isObex=obex.QuickSyncOperation.Upload
-                )
-                counter += 1
-
-        time.sleep(at.Delay.ObexBoundary)
-        sendAndReadResponse(at.formatCommand(at.Command.ExitObex), wait=at.Delay.ObexBoundary)
-        time.sleep(at.Delay.AfterExitObex)
-        sendAndReadResponse(at.formatCommand(at.Command.Reset), wait=at.Delay.AfterExitObex)
-
-
-    elif(args.action == 'delete'):
-        if(not args.options):
-            raise Exception('Please give the file name of the file which should be deleted')
+        if(failed): return 1
 
-        sendAndReadResponse(at.formatCommand(at.Command.EnterObex), wait=at.Delay.AfterEnterObex)
-        sendAndReadResponse(
-            obex.compileConnect(obex.compileMessage(obex.Header.Target, obex.ServiceUuid.DesSync)),
-            isObex=True
-        )
 
-        sendAndReadResponse(
-            obex.compileMessage(
-                obex.OpCode.Put+obex.Mask.Final,
-                obex.compileNameHeader( args.options )
-            ),
-            isObex=True
-        )
+    elif(args.action in obexActions):
+        checkObexAction(args.action, args.options, args.file)
 
-        time.sleep(at.Delay.ObexBoundary)
-        sendAndReadResponse(at.formatCommand(at.Command.ExitObex), wait=at.Delay.ObexBoundary)
-        time.sleep(at.Delay.AfterExitObex)
-        sendAndReadResponse(at.formatCommand(at.Command.Reset), wait=at.Delay.AfterExitObex)
+        loadDeviceProfile(client, configParser)
+        if(args.action in serialActions): querySerial(client)
+        if(args.action in areaCodeActions): queryAreaCodes(client)
+        if(args.action in indexActions and indexActions[args.action](client, args.options, args.file)):
+            return 0 # answered from the directory index
+        if(args.at_upload and args.action in atActions and atActions[args.action](client, args.options, args.file)):
+            return 0 # done without Obex mode
+        with client.obexSession():
+            obexActions[args.action](client, args.options, args.file)
 
 
     else:
         print('Unknown action: {0}'.format(args.action))
-        exit(1)
+        return 1
+
+    return 0
 
 
 if __name__ == "__main__":
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+
+# Record the serial communication of a session into a file and replay it later without a device.
+# A recording is a JSON lines file: one header line, followed by one line per write/read call
+# with the seconds since the start of the session and the bytes as hex:
+#   {"version": 1, "device": "/dev/ttyACM0", "baud": 9600, "action": "listfiles", "options": null, "file": "-"}
+#   {"t": 0.000412, "w": "41542b4347534e0d0a"}
+#   {"t": 0.011034, "r": "0d0a3031323334..."}
+
+import json
+import time
+
+
+class ReplayMismatchException(Exception):
+    pass
+
+class RecordingSerial:
+    # wraps an opened serial port and writes every byte which is sent or received into a recording
+    def __init__(self, ser, path, header=None):
+        self.ser = ser
+        self.f = open(path, 'w')
+        self.start = time.monotonic()
+        self.f.write(json.dumps(dict(header or {}, version=1))+'\n')
+
+    def log(self, direction, data):
+        if(not data): return
+        self.f.write(json.dumps({'t': round(time.monotonic() - self.start, 6), direction: bytes(data).hex()})+'\n')
+
+    def write(self, data):
+        self.log('w', data)
+        return self.ser.write(data)
+
+    def read(self, size=1):
+        data = self.ser.read(size)
+        self.log('r', data)
+        return data
+
+    def close(self):
+        self.f.close()
+        self.ser.close()
+
+    def __getattr__(self, name):
+        # fileno, in_waiting, timeout, reset_input_buffer, ... of the real port
+        return getattr(self.ser, name)
+
+    def __setattr__(self, name, value):
+        if(name in ['timeout', 'baudrate']): setattr(self.ser, name, value)
+        else: super().__setattr__(name, value)
+
+
+def readRecording(path):
+    with open(path, 'r') as f:
+        header = json.loads(f.readline())
+        if(header.get('version') != 1):
+            raise Exception('Unsupported recording format: {0}'.format(path))
+        events = []
+        for line in f:
+            event = json.loads(line)
+            direction = 'w' if('w' in event) else 'r'
+            events.append((event['t'], direction, bytes.fromhex(event[direction])))
+    return header, events
+
+class ReplaySerial:
+    # plays a recording back as if it was a serial port: writes must match the recorded writes,
+    # the recorded reads after a write are returned to the caller, either with their original
+    # timing (realtime) or as soon as they are requested. Has no fileno(), so the transport
+    # uses `timeout` and read() like for other ports without a file descriptor.
+    def __init__(self, path, realtime=True):
+        self.header, self.events = readRecording(path)
+        self.name = 'replay:'+path
+        self.realtime = realtime
+        self.timeout = None
+        self.baudrate = self.header.get('baud')
+        self.position = 0
+        self.chunk = b''
+        # time of the last write in the recording and during the replay, to schedule the reads
+        self.recordedWrite = 0
+        self.replayedWrite = time.monotonic()
+
+    def write(self, data):
+        data = bytes(data)
+        expected = None
+        if(self.position < len(self.events) and self.events[self.position][1] == 'w'):
+            self.recordedWrite, direction, expected = self.events[self.position]
+            self.position += 1
+        if(expected != data):
+            raise ReplayMismatchException(
+                'Replay diverged from recording (other arguments, config or cache?): sent {0}, recorded {1}'.format(
+                    data[:40], expected[:40] if(expected is not None) else 'nothing'
+            ))
+        self.chunk = b''
+        self.replayedWrite = time.monotonic()
+        return len(data)
+
+    def nextChunk(self, wait):
+        # the next recorded read before the next write, waiting until it is due in realtime mode
+        if(self.position >= len(self.events) or self.events[self.position][1] != 'r'):
+            if(wait and self.realtime and self.timeout):
+                time.sleep(self.timeout) # the device did not answer in the recording
+            return b''
+        t, direction, recorded = self.events[self.position]
+        if(self.realtime):
+            delay = self.replayedWrite + (t - self.recordedWrite) - time.monotonic()
+            if(delay > 0):
+                if(not wait): return b''
+                if(self.timeout is not None and delay > self.timeout):
+                    time.sleep(self.timeout)
+                    return b''
+                time.sleep(delay)
+        self.position += 1
+        return recorded
+
+    def read(self, size=1):
+        if(size <= 0): return b''
+        if(not self.chunk): self.chunk = self.nextChunk(wait=True)
+        data, self.chunk = self.chunk[:size], self.chunk[size:]
+        return data
+
+    @property
+    def in_waiting(self):
+        if(not self.chunk): self.chunk = self.nextChunk(wait=False)
+        return len(self.chunk)
+
+    def reset_input_buffer(self):
+        self.chunk = b''
+
+    def remaining(self):
+        return len(self.events) - self.position
+
+    def close(self):
+        pass
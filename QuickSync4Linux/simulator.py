@@ -0,0 +1,601 @@
+#!/usr/bin/env python3
+
+# Simulates a Gigaset handset on a pseudo terminal, speaking the AT command set and the Obex subset
+# used by QuickSync4Linux. Start it with `python3 -m QuickSync4Linux.simulator` and pass the printed
+# port to QuickSync4Linux via `--device`.
+
+import argparse
+import datetime
+import termios
+import random
+import struct
+import select
+import threading
+import time
+import tty
+import pty
+import os
+import re
+
+from . import at
+from . import obex
+
+
+class VirtualFile:
+    def __init__(self, data, modified=None):
+        self.data = data
+        self.modified = modified or datetime.datetime.now()
+
+class Simulator:
+    def __init__(self, model='S700H PRO', latency=0, responseDelay=0, baud=0, fragment=0,
+                 errorRate=0, errors=('drop', 'busy'), switchTime=0, guardTime=0,
+                 maxPacket=1024, memoryTotal=1024*1024, srm='off', maxBaud=0, byteErrorRate=0, seed=None):
+        self.model = model
+        self.latency = latency # additional seconds per sent byte
+        self.responseDelay = responseDelay # seconds until the first byte of a response
+        self.baud = baud # emulated line speed (0 = unlimited)
+        self.fragment = fragment # max bytes per write (0 = whole response at once)
+        self.errorRate = errorRate # probability of an injected error per request
+        self.byteErrorRate = byteErrorRate # probability of a broken byte: a lossy link loses long Obex packets more often
+        self.errors = errors # kinds of injected errors: drop (no answer), busy (AT ERROR/Obex ServiceUnavailable)
+        self.switchTime = switchTime # seconds after a mode switch in which the device ignores input
+        self.guardTime = guardTime # silence required before the "+++" escape sequence
+        self.maxPacket = maxPacket
+        self.memoryTotal = memoryTotal
+        self.maxBaud = maxBaud # UART device: line speed as set by the host, garbled above this rate (0 = USB, any rate works)
+        self.srm = srm # Obex Single Response Mode: on, off (header ignored like by known devices) or reject (BadRequest)
+        self.random = random.Random(seed)
+
+        self.files = {
+            obex.FolderPath.ScreenSavers: {
+                'Gigaset.jpg': VirtualFile(b'\xff\xd8\xff\xe0' + bytes(4000) + b'\xff\xd9'),
+            },
+            obex.FolderPath.ClipPictures: {},
+            obex.FolderPath.Ringtones: {
+                'Classic.L22': VirtualFile(bytes(range(256)) * 64),
+            },
+        }
+        self.contacts = {}
+        self.changeLog = [] # list of (change counter, type, luid)
+        self.changeCounter = 0
+        self.nextLuid = 1
+        for vcard in [
+            'BEGIN:VCARD\r\nVERSION:2.1\r\nN:Doe;John\r\nTEL;HOME:+49123456789\r\nEND:VCARD',
+            'BEGIN:VCARD\r\nVERSION:2.1\r\nN:Mustermann;Erika\r\nTEL;CELL:+49456789123\r\nTEL;WORK:+49789123456\r\nEND:VCARD',
+        ]:
+            self.storeContact(None, vcard)
+        # call logs by path, newest call first: list of (time, number, name)
+        self.callLogs = {
+            obex.FilePath.IncomingCalls: [],
+            obex.FilePath.OutgoingCalls: [],
+            obex.FilePath.MissedCalls: [],
+        }
+        now = datetime.datetime.now().replace(microsecond=0)
+        self.addCall(obex.FilePath.IncomingCalls, '+49123456789', 'John Doe', now - datetime.timedelta(days=1))
+        self.addCall(obex.FilePath.OutgoingCalls, '+49456789123', 'Erika Mustermann', now - datetime.timedelta(hours=5))
+        self.addCall(obex.FilePath.MissedCalls, '+49301234567', '', now - datetime.timedelta(hours=2))
+        self.addCall(obex.FilePath.MissedCalls, '+49123456789', 'John Doe', now - datetime.timedelta(minutes=30))
+
+        self.obexMode = False
+        self.ignoreUntil = 0
+        self.lastInput = 0
+        self.peerMaxPacket = 255
+        self.pendingGet = None
+        self.pendingPut = None
+        self.pendingImage = None
+        self.imagePartSize = 256
+        self.currentFolder = ''
+        self.requests = 0
+
+        self.master, self.slave = pty.openpty()
+        tty.setraw(self.slave)
+        self.port = os.ttyname(self.slave)
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.running = False
+        if(self.thread): self.thread.join()
+        os.close(self.master)
+        os.close(self.slave)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    # --- line emulation
+
+    def hostBaud(self):
+        # the baud rate which the host configured on its end of the pseudo terminal
+        speed = termios.tcgetattr(self.slave)[5]
+        for name in dir(termios):
+            if(re.fullmatch(r'B\d+', name) and getattr(termios, name) == speed):
+                return int(name[1:])
+        return 0
+
+    def lineBaud(self):
+        if(self.maxBaud): return self.hostBaud() or self.baud
+        return self.baud
+
+    def byteTime(self):
+        baud = self.lineBaud()
+        return self.latency + (10 / baud if baud else 0)
+
+    def garble(self, data):
+        # a UART at a rate the device does not support: many bytes arrive broken
+        if(not self.maxBaud or self.hostBaud() <= self.maxBaud): return data
+        return bytes(self.random.randrange(256) if self.random.random() < 0.3 else byte for byte in data)
+
+    def send(self, data):
+        if(not data): return
+        if(self.responseDelay): time.sleep(self.responseDelay)
+        data = self.garble(data)
+        offset = 0
+        while(offset < len(data)):
+            size = len(data) - offset
+            if(self.fragment): size = min(size, self.random.randint(1, self.fragment))
+            chunk = data[offset:offset+size]
+            if(self.byteTime()): time.sleep(len(chunk) * self.byteTime())
+            os.write(self.master, chunk)
+            offset += size
+
+    def injectError(self):
+        if(self.errorRate and self.errors and self.random.random() < self.errorRate):
+            return self.random.choice(self.errors)
+        return None
+
+    def run(self):
+        buf = b''
+        while self.running:
+            ready, _, _ = select.select([self.master], [], [], 0.1)
+            if(not ready): continue
+            data = self.garble(os.read(self.master, 65536))
+            now = time.monotonic()
+            silence = now - self.lastInput
+            self.lastInput = now
+            if(self.lineBaud()): time.sleep(len(data) * 10 / self.lineBaud())
+            if(now < self.ignoreUntil):
+                # device is still busy switching modes
+                continue
+            buf += data
+            buf = self.process(buf, silence)
+
+    def process(self, buf, silence):
+        while buf:
+            if(self.obexMode):
+                if(buf.startswith(b'+++')):
+                    if(silence >= self.guardTime):
+                        self.obexMode = False
+                        self.ignoreUntil = time.monotonic() + self.switchTime
+                    buf = buf[3:]
+                    continue
+                if(buf[0] not in self.obexOpCodes()):
+                    return b'' # garbage, drop it like the device does
+                if(len(buf) < 3): return buf
+                length = struct.unpack('>H', buf[1:3])[0]
+                if(len(buf) < length): return buf
+                packet, buf = buf[:length], buf[length:]
+                self.requests += 1
+                self.send(self.handleObex(packet))
+            else:
+                if(b'\r' not in buf): return buf
+                line, buf = buf.split(b'\r', 1)
+                line = line.strip(b'\n')
+                if(buf.startswith(b'\n')): buf = buf[1:]
+                if(not line): continue
+                self.requests += 1
+                self.send(self.handleAt(line.decode('ascii', errors='replace')))
+        return buf
+
+    def obexOpCodes(self):
+        return [
+            obex.OpCode.Connect, obex.OpCode.Disconnect, obex.OpCode.Put, obex.OpCode.Put+obex.Mask.Final,
+            obex.OpCode.Get, obex.OpCode.Get+obex.Mask.Final, obex.OpCode.SetPath, obex.OpCode.Abort,
+        ]
+
+    # --- AT command set
+
+    def atResponses(self):
+        return {
+            at.Command.GetManufacturer: 'Gigaset',
+            at.Command.GetDeviceType: self.model,
+            at.Command.GetProductName: self.model,
+            at.Command.GetSerialNumber: '0123456789ABCDEF',
+            at.Command.GetInternalName: '^SHSN: "INT 1"',
+            at.Command.GetBatteryState: '+CBC: 0,80',
+            at.Command.GetSignalState: '+CSQ: 25,99',
+            at.Command.GetFirmwareVersion: '42.064',
+            at.Command.GetFirmwareUrl: '^SURL: "http://update.gigaset.net"',
+            at.Command.ListMelodies: '^RM: (1-10)',
+            at.Command.GetAreaCodes: '^SACO: 00,49,0,30',
+            at.Command.GetHardwareConnectionState: '^SGST: 1',
+            at.Command.GetSupportedFeatures: '^LOSF: (1,2,3,4)',
+            at.Command.GetSupportedMultimedia: '^HSMM: 1,1,1',
+            at.Command.GetScreenSizeClip: '^WPPS: 128,86',
+            at.Command.GetScreenSizeFull: '^WPPS: 240,320',
+            at.Command.GetExtendedModesList: '^SQWE: (0,1,3,55)',
+            at.Command.GetCurrentExtendedMode: '^SQWE: 0',
+            at.Command.GetCharset1: '^WPCS: "UTF-8"',
+            at.Command.GetCharset2: '^WPCS: "UTF-8"',
+            at.Command.GetMWI: '^HMWI: 0',
+            at.Command.Ping: '',
+            at.Command.Answer: '',
+            at.Command.HangUp: '',
+            at.Command.SwitchHandsFree: '',
+            at.Command.Reset.strip()+'\r\n': '',
+        }
+
+    def handleAt(self, line):
+        echo = (line + '\r').encode('ascii', errors='replace')
+        error = self.injectError()
+        if(error == 'drop'): return b''
+        if(error == 'busy'): return echo + b'\r\nERROR\r\n'
+
+        response = None
+        command = line + '\r\n'
+        if(command in self.atResponses()):
+            response = self.atResponses()[command]
+        elif(line.startswith('ATD')):
+            response = ''
+        elif(line == at.Command.EnterObex.strip()):
+            self.obexMode = True
+            self.currentFolder = ''
+            self.ignoreUntil = time.monotonic() + self.switchTime
+            response = ''
+        elif(line.startswith('AT+CMEE') or line.startswith('AT^SACO=')):
+            response = ''
+        elif(line == at.Command.InitializeImageUpload.strip()):
+            response = '^DMPU: (1-{0})'.format(self.imagePartSize)
+        elif(line == at.Command.GetImageUploadResult.strip()):
+            response = '^DMPU: {0}'.format(self.finishImageUpload())
+        elif(line.startswith('AT^DMPU=')):
+            response = self.startImageUpload(line[len('AT^DMPU='):])
+        elif(line.startswith('AT^DMPW=')):
+            response = self.receiveImagePart(line[len('AT^DMPW='):])
+
+        if(response is None):
+            return echo + b'\r\nERROR\r\n'
+        if(response):
+            return echo + b'\r\n' + response.encode('ascii') + b'\r\n\r\nOK\r\n'
+        return echo + b'\r\nOK\r\n'
+
+    # picture upload in AT mode: AT^DMPU="<path>",<size>,<parts>, then AT^DMPW=<part>,<offset>,<length>,<hex data>
+    # for every part and AT^DMPU? for the result (0 = stored, 1 = incomplete, 2 = memory full, 3 = no upload)
+
+    def startImageUpload(self, arguments):
+        match = re.fullmatch(r'"([^"]+)",(\d+),(\d+)', arguments)
+        if(not match): return None
+        folder, name = self.splitPath(match.group(1))
+        if(folder not in [obex.FolderPath.ScreenSavers, obex.FolderPath.ClipPictures] or not name): return None
+        self.pendingImage = {'path': match.group(1), 'size': int(match.group(2)), 'parts': int(match.group(3)), 'data': {}}
+        return ''
+
+    def receiveImagePart(self, arguments):
+        match = re.fullmatch(r'(\d+),(\d+),(\d+),([0-9A-Fa-f]*)', arguments)
+        if(not match or self.pendingImage is None): return None
+        data = bytes.fromhex(match.group(4))
+        if(len(data) != int(match.group(3)) or len(data) > self.imagePartSize): return None
+        self.pendingImage['data'][int(match.group(1))] = (int(match.group(2)), data)
+        return ''
+
+    def finishImageUpload(self):
+        image, self.pendingImage = self.pendingImage, None
+        if(image is None): return 3
+        data = b''.join(part for offset, part in sorted(image['data'].values()))
+        if(len(image['data']) != image['parts'] or len(data) != image['size']): return 1
+        if(self.memoryUsed() + len(data) > self.memoryTotal): return 2
+        folder, name = self.splitPath(image['path'])
+        self.files[folder][name] = VirtualFile(data)
+        return 0
+
+    # --- Obex
+
+    def response(self, code, payload=b''):
+        return obex.compileMessage(code | obex.Mask.Final, payload)
+
+    def parseRequestHeaders(self, packet, offset):
+        headers = {}
+        for header in obex.parseHeaders(packet, offset):
+            if(header.id in [obex.Header.Body, obex.Header.EndOfBody]):
+                headers[header.id] = headers.get(header.id, b'') + header.value()
+            elif(header.id == obex.Header.Name):
+                headers[header.id] = bytes(header.value()).decode('utf-16-be', errors='replace').strip('\x00')
+            elif(isinstance(header.value(), memoryview)):
+                headers[header.id] = bytes(header.value())
+            else:
+                headers[header.id] = header.value()
+        return headers
+
+    def handleObex(self, packet):
+        opcode = packet[0]
+        if(len(packet) > self.maxPacket):
+            return self.response(obex.ReCode.BadRequest)
+        error = self.injectError()
+        # packets which are not answered in Single Response Mode can not lose their answer
+        streamed = (self.pendingPut is not None and self.pendingPut['srm'] and opcode == obex.OpCode.Put)
+        if(error == 'drop' and not streamed): return b''
+        if(self.byteErrorRate and not streamed and self.random.random() > (1 - self.byteErrorRate) ** len(packet)):
+            return b'' # broken packet, not answered
+        if(error == 'busy'): return self.response(obex.ReCode.ServiceUnavailable)
+
+        if(opcode == obex.OpCode.Connect):
+            self.peerMaxPacket = struct.unpack('>H', packet[5:7])[0]
+            return self.response(obex.ReCode.Success,
+                obex.Connection.Version + obex.Connection.Flags + struct.pack('>H', self.maxPacket)
+            )
+        elif(opcode == obex.OpCode.Disconnect):
+            return self.response(obex.ReCode.Success)
+        elif(opcode == obex.OpCode.Abort):
+            self.pendingGet = None
+            self.pendingPut = None
+            return self.response(obex.ReCode.Success)
+        elif(opcode == obex.OpCode.SetPath):
+            headers = self.parseRequestHeaders(packet, 5)
+            name = headers.get(obex.Header.Name, '')
+            if(packet[3] & obex.SetPathFlags.LayerUp):
+                self.currentFolder = ''
+            elif(name == ''):
+                self.currentFolder = ''
+            else:
+                folder = '/' + name.strip('/')
+                if(folder not in self.files):
+                    return self.response(obex.ReCode.NotFound)
+                self.currentFolder = folder
+            return self.response(obex.ReCode.Success)
+        elif(opcode & obex.Mask.NotFinal == obex.OpCode.Get):
+            return self.handleGet(packet)
+        elif(opcode & obex.Mask.NotFinal == obex.OpCode.Put):
+            return self.handlePut(packet)
+        return self.response(obex.ReCode.NotImplemented)
+
+    def srmRequested(self, headers):
+        return headers.get(obex.Header.SingleResponseMode) == obex.SingleResponseMode.Enable
+
+    def handleGet(self, packet):
+        headers = self.parseRequestHeaders(packet, 3)
+        if(self.srmRequested(headers) and self.srm == 'reject'):
+            return self.response(obex.ReCode.BadRequest)
+        if(self.pendingGet is None):
+            if(obex.Header.AppParameters in headers):
+                param = headers[obex.Header.AppParameters]
+                if(param == obex.AppParametersCommand.MemoryStatusTotal):
+                    value = self.memoryTotal
+                else:
+                    value = self.memoryTotal - self.memoryUsed()
+                return self.response(obex.ReCode.Success,
+                    obex.compileMessage(obex.Header.AppParameters, b'\x32\x04' + struct.pack('>I', value))
+                )
+            data = self.readObject(headers)
+            if(data is None):
+                return self.response(obex.ReCode.NotFound)
+            self.pendingGet = [data, 0, True]
+            if(self.srm == 'on' and self.srmRequested(headers)):
+                # Single Response Mode: all packets at once, without waiting for continuation requests
+                responses = b''
+                while self.pendingGet is not None:
+                    responses += self.nextGetResponse(srm=True)
+                return responses
+        return self.nextGetResponse()
+
+    def nextGetResponse(self, srm=False):
+        data, offset, first = self.pendingGet
+        space = min(self.peerMaxPacket, self.maxPacket) - 3 - 3
+        extraHeaders = b''
+        if(first):
+            extraHeaders = obex.compileLengthHeader(len(data))
+            if(srm): extraHeaders += obex.compileSrmHeader()
+            space -= len(extraHeaders)
+        chunk = data[offset:offset+space]
+        offset += len(chunk)
+        if(offset >= len(data)):
+            self.pendingGet = None
+            return self.response(obex.ReCode.Success, extraHeaders + obex.compileMessage(obex.Header.EndOfBody, chunk))
+        self.pendingGet = [data, offset, False]
+        return self.response(obex.ReCode.Continue, extraHeaders + obex.compileMessage(obex.Header.Body, chunk))
+
+    def handlePut(self, packet):
+        final = packet[0] & obex.Mask.Final
+        headers = self.parseRequestHeaders(packet, 3)
+        if(self.srmRequested(headers) and self.srm == 'reject'):
+            return self.response(obex.ReCode.BadRequest)
+        srmHeader = b''
+        if(self.pendingPut is None):
+            self.pendingPut = {'name': headers.get(obex.Header.Name), 'data': b'', 'body': False, 'srm': False}
+            if(self.srm == 'on' and self.srmRequested(headers)):
+                self.pendingPut['srm'] = True
+                srmHeader = obex.compileSrmHeader()
+        elif(self.pendingPut['srm'] and not final):
+            srmHeader = None # Single Response Mode: only the first and the last packet are answered
+        if(obex.Header.Body in headers or obex.Header.EndOfBody in headers):
+            self.pendingPut['body'] = True
+            self.pendingPut['data'] += headers.get(obex.Header.Body, b'') + headers.get(obex.Header.EndOfBody, b'')
+        if(not final):
+            return b'' if(srmHeader is None) else self.response(obex.ReCode.Continue, srmHeader)
+
+        put = self.pendingPut
+        self.pendingPut = None
+        if(not put['name']):
+            return self.response(obex.ReCode.BadRequest)
+        return self.response(self.writeObject(put['name'], put['data'] if put['body'] else None))
+
+    # --- virtual file system
+
+    def splitPath(self, path):
+        path = '/' + path.strip('/')
+        folder, _, name = path.rpartition('/')
+        return folder, name
+
+    def memoryUsed(self):
+        return sum(len(f.data) for folder in self.files.values() for f in folder.values())
+
+    def phoneBook(self):
+        return ''.join(self.contactWithLuid(luid)+'\r\n' for luid in sorted(self.contacts)).encode('utf8')
+
+    def contactWithLuid(self, luid):
+        lines = self.contacts[luid].split('\r\n')
+        lines.insert(2, 'X-IRMC-LUID:{0}'.format(luid))
+        return '\r\n'.join(lines)
+
+    def storeContact(self, luid, vcard):
+        vcard = re.sub(r'X-IRMC-LUID:[^\r\n]*\r\n', '', vcard.replace('\r\n', '\n').replace('\n', '\r\n').strip())
+        if(luid is None):
+            luid = self.nextLuid
+            self.nextLuid += 1
+        self.contacts[luid] = vcard
+        self.changeCounter += 1
+        self.changeLog.append((self.changeCounter, 'M', luid))
+        return luid
+
+    def deleteContact(self, luid):
+        del self.contacts[luid]
+        self.changeCounter += 1
+        self.changeLog.append((self.changeCounter, 'H', luid))
+
+    def changeLogSince(self, changeCounter):
+        lines = [
+            'SN:0123456789ABCDEF',
+            'DID:1',
+            'Total-Records:{0}'.format(len(self.contacts)),
+            'Maximum-Records:500',
+        ]
+        for cc, kind, luid in self.changeLog:
+            if(cc > changeCounter):
+                lines.append('{0}:{1}::{2}'.format(kind, cc, luid))
+        return ('\r\n'.join(lines) + '\r\n').encode('ascii')
+
+    def addCall(self, path, number, name='', callTime=None):
+        calls = self.callLogs[path]
+        calls.insert(0, (callTime or datetime.datetime.now().replace(microsecond=0), number, name))
+        del calls[30:] # the device only keeps the latest calls
+
+    def callLog(self, path):
+        vcards = []
+        for callTime, number, name in self.callLogs[path]:
+            lines = ['BEGIN:VCARD', 'VERSION:2.1']
+            if(name): lines.append('N:'+';'.join(reversed(name.split(' ', 1))))
+            lines.append('TEL:'+number)
+            lines.append('X-IRMC-CALL-DATETIME:'+callTime.strftime('%Y%m%dT%H%M%S'))
+            lines.append('END:VCARD')
+            vcards.append('\r\n'.join(lines)+'\r\n')
+        return ''.join(vcards).encode('utf8')
+
+    def readObject(self, headers):
+        if(obex.Header.Type in headers):
+            mimeType = headers[obex.Header.Type].decode('ascii', errors='replace')
+            if(mimeType == obex.ObjectMimeType.FolderListing):
+                return self.folderListing(self.currentFolder)
+            return None
+
+        path = '/' + headers.get(obex.Header.Name, '').strip('/')
+        if(path == obex.FilePath.PhoneBook):
+            return self.phoneBook()
+        elif(path == obex.FilePath.InfoLog):
+            return 'Total-Records:{0}\r\nMaximum-Records:500\r\n'.format(len(self.contacts)).encode('ascii')
+        elif(path == obex.FilePath.DevInfo):
+            return 'MANU:Gigaset\r\nMOD:{0}\r\nSN:0123456789ABCDEF\r\nIRMC-VERSION:1.1\r\n'.format(self.model).encode('ascii')
+        elif(path == obex.FilePath.LuidCC):
+            return str(self.changeCounter).encode('ascii')
+        elif(path.lstrip('/') in self.callLogs):
+            return self.callLog(path.lstrip('/'))
+
+        match = re.fullmatch(r'/telecom/pb/luid/(\d+)\.log', path)
+        if(match):
+            return self.changeLogSince(int(match.group(1)))
+        match = re.fullmatch(r'/telecom/pb/luid/(\d+)\.vcf', path)
+        if(match):
+            luid = int(match.group(1))
+            return (self.contactWithLuid(luid)+'\r\n').encode('utf8') if luid in self.contacts else None
+
+        folder, name = self.splitPath(path)
+        if(folder in self.files and name in self.files[folder]):
+            return self.files[folder][name].data
+        return None
+
+    def writeObject(self, path, data):
+        path = '/' + path.strip('/')
+        if(path in [obex.FilePath.NewVCardGQS, obex.FilePath.NewVCardGDS]):
+            if(data is None): return obex.ReCode.BadRequest
+            self.storeContact(None, data.decode('utf8', errors='replace'))
+            return obex.ReCode.Success
+
+        match = re.fullmatch(r'/telecom/pb/luid/(\d+)\.vcf', path)
+        if(match):
+            luid = int(match.group(1))
+            if(data is None):
+                if(luid not in self.contacts): return obex.ReCode.NotFound
+                self.deleteContact(luid)
+            else:
+                self.storeContact(luid, data.decode('utf8', errors='replace'))
+            return obex.ReCode.Success
+
+        folder, name = self.splitPath(path)
+        if(folder not in self.files): return obex.ReCode.NotFound
+        if(data is None):
+            if(name not in self.files[folder]): return obex.ReCode.NotFound
+            del self.files[folder][name]
+            return obex.ReCode.Success
+        if(self.memoryUsed() + len(data) > self.memoryTotal):
+            return obex.ReCode.DatabaseFull
+        self.files[folder][name] = VirtualFile(data)
+        return obex.ReCode.Success
+
+    def folderListing(self, folder):
+        if(folder not in self.files): return None
+        lines = [
+            '<?xml version="1.0"?>',
+            '<!DOCTYPE folder-listing SYSTEM "obex-folder-listing.dtd">',
+            '<folder-listing version="1.0">',
+        ]
+        for fileid, (name, f) in enumerate(sorted(self.files[folder].items()), 1):
+            lines.append('<file name="{0}" size="{1}" fileid="{2}" modified="{3}" user-perm="RWD" group-perm="R"/>'.format(
+                name.replace('&', '&amp;').replace('"', '&quot;').replace('<', '&lt;'),
+                len(f.data), fileid, f.modified.strftime('%Y%m%dT%H%M%S')
+            ))
+        lines.append('</folder-listing>')
+        return '\r\n'.join(lines).encode('utf8')
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog='QuickSync4Linux.simulator',
+        description='Simulate a Gigaset device on a pseudo terminal'
+    )
+    parser.add_argument('--model', default='S700H PRO', help='device type reported via AT+CGMM/AT^WPPN')
+    parser.add_argument('--latency', type=float, default=0, help='additional seconds per sent byte')
+    parser.add_argument('--response-delay', type=float, default=0, help='seconds until the first byte of every response')
+    parser.add_argument('--baud', type=int, default=0, help='emulated line speed, 0 = unlimited')
+    parser.add_argument('--fragment', type=int, default=0, help='split responses into random chunks of at most this many bytes')
+    parser.add_argument('--error-rate', type=float, default=0, help='probability of an injected error per request')
+    parser.add_argument('--errors', default='drop,busy', help='comma separated kinds of injected errors: drop, busy')
+    parser.add_argument('--switch-time', type=float, default=0, help='seconds the device ignores input after a mode switch')
+    parser.add_argument('--guard-time', type=float, default=0, help='silence required before the "+++" escape sequence')
+    parser.add_argument('--max-packet', type=int, default=1024, help='max Obex packet size of the device')
+    parser.add_argument('--srm', default='off', choices=['on', 'off', 'reject'], help='Obex Single Response Mode: accept, ignore or reject the header')
+    parser.add_argument('--max-baud', type=int, default=0, help='behave like a UART: use the baud rate of the host as line speed and garble data above this rate, 0 = USB (any rate)')
+    parser.add_argument('--byte-error-rate', type=float, default=0, help='probability of a broken byte, Obex packets with a broken byte are not answered')
+    parser.add_argument('--seed', type=int, default=None, help='random seed for reproducible fragmentation/errors')
+    args = parser.parse_args()
+
+    simulator = Simulator(
+        model=args.model, latency=args.latency, responseDelay=args.response_delay, baud=args.baud,
+        fragment=args.fragment, errorRate=args.error_rate, errors=tuple(filter(None, args.errors.split(','))),
+        switchTime=args.switch_time, guardTime=args.guard_time, maxPacket=args.max_packet, srm=args.srm, maxBaud=args.max_baud,
+        byteErrorRate=args.byte_error_rate, seed=args.seed
+    )
+    print('Simulated device listening on:', simulator.port, flush=True)
+    simulator.start()
+    try:
+        while True: time.sleep(1)
+    except KeyboardInterrupt:
+        simulator.stop()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+
+# Timing of every request sent to the device: time to first byte, total latency, bytes and
+# reads, and the time spent in `Delay` sleeps. Shows whether the device or our delays are slow.
+
+import json
+import time
+
+
+class CommandTiming:
+    __slots__ = ('name', 'kind', 'start', 'firstByte', 'end', 'sleep', 'bytesOut', 'bytesIn', 'reads', 'error')
+
+    def __init__(self, name, kind, start, firstByte, end, sleep, bytesOut=0, bytesIn=0, reads=0, error=None):
+        self.name = name
+        self.kind = kind
+        self.start = start
+        self.firstByte = firstByte
+        self.end = end
+        self.sleep = sleep
+        self.bytesOut = bytesOut
+        self.bytesIn = bytesIn
+        self.reads = reads
+        self.error = error
+
+    @property
+    def latency(self):
+        return self.end - self.start
+
+    @property
+    def ttfb(self):
+        return None if(self.firstByte is None) else self.firstByte - self.start
+
+    def toDict(self, origin=0):
+        return {
+            'name': self.name,
+            'kind': self.kind,
+            'start': round(self.start - origin, 6),
+            'ttfb': None if(self.ttfb is None) else round(self.ttfb, 6),
+            'latency': round(self.latency, 6),
+            'sleep': round(self.sleep, 6),
+            'bytesOut': self.bytesOut,
+            'bytesIn': self.bytesIn,
+            'reads': self.reads,
+            'error': self.error,
+        }
+
+    @classmethod
+    def fromDict(cls, data, origin=0):
+        start = origin + data['start']
+        return cls(
+            data['name'], data['kind'], start,
+            None if(data['ttfb'] is None) else start + data['ttfb'],
+            start + data['latency'], data['sleep'],
+            data['bytesOut'], data['bytesIn'], data['reads'], data['error'],
+        )
+
+def requestName(data, isObex):
+    # AT commands without their arguments if these may be private (phone numbers)
+    if(data is None): return 'sleep'
+    if(isObex):
+        if(not data): return 'Obex pending answers'
+        from . import obex
+        opcode = data[0] & obex.Mask.NotFinal
+        for name, value in vars(obex.OpCode).items():
+            if(not name.startswith('_') and value & obex.Mask.NotFinal == opcode):
+                return 'Obex '+name
+        return 'Obex 0x{0:02x}'.format(data[0])
+    if(not data): return 'AT pending answers'
+    command = bytes(data).decode('ascii', errors='replace').strip()
+    if(command.startswith('ATD')): return command.split(' ')[0]
+    return command
+
+
+class TimingRecorder:
+    def __init__(self):
+        self.origin = time.monotonic()
+        self.timings = []
+
+    def record(self, request, start, end, sleep, reader=None, error=None):
+        self.timings.append(CommandTiming(
+            requestName(request.data, request.isObex),
+            'sleep' if(request.data is None) else ('obex' if(request.isObex) else 'at'),
+            start,
+            reader.firstByte if(reader) else None,
+            end,
+            sleep,
+            reader.bytesOut if(reader) else 0,
+            reader.bytesIn if(reader) else 0,
+            reader.reads if(reader) else 0,
+            str(error) if(error) else None,
+        ))
+
+    def toDicts(self):
+        return [timing.toDict(self.origin) for timing in self.timings]
+
+    def extend(self, dicts):
+        # add timings which were recorded somewhere else (e.g. by quicksyncd)
+        origin = time.monotonic() - max([data['start'] + data['latency'] for data in dicts], default=0)
+        self.timings += [CommandTiming.fromDict(data, origin) for data in dicts]
+
+    def writeJsonLines(self, f):
+        for data in self.toDicts():
+            f.write(json.dumps(data)+'\n')
+
+    def writeChromeTrace(self, f):
+        # open in chrome://tracing or https://ui.perfetto.dev
+        events = []
+        for timing in self.timings:
+            start = (timing.start - self.origin) * 1000000
+            events.append({
+                'name': timing.name, 'cat': timing.kind, 'ph': 'X', 'pid': 1, 'tid': 1,
+                'ts': round(start), 'dur': round(timing.latency * 1000000),
+                'args': timing.toDict(self.origin),
+            })
+            if(timing.kind != 'sleep' and timing.sleep):
+                # the settle time after a command, nested into the command event
+                events.append({
+                    'name': 'sleep', 'cat': 'sleep', 'ph': 'X', 'pid': 1, 'tid': 1,
+                    'ts': round(start + (timing.latency - timing.sleep) * 1000000),
+                    'dur': round(timing.sleep * 1000000),
+                })
+        json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+
+    def write(self, path):
+        with open(path, 'w') as f:
+            if(path.endswith('.jsonl')): self.writeJsonLines(f)
+            else: self.writeChromeTrace(f)
+
+    def summary(self):
+        groups = {}
+        for timing in self.timings:
+            groups.setdefault(timing.name, []).append(timing)
+
+        lines = ['{0:<16} {1:>5} {2:>9} {3:>8} {4:>8} {5:>9} {6:>8} {7:>8} {8:>6}'.format(
+            'Command', 'Count', 'Total ms', 'Avg ms', 'TTFB ms', 'Sleep ms', 'Out B', 'In B', 'Reads'
+        )]
+        for name, timings in sorted(groups.items(), key=lambda item: -sum(t.latency for t in item[1])):
+            total = sum(t.latency for t in timings)
+            ttfbs = [t.ttfb for t in timings if t.ttfb is not None]
+            lines.append('{0:<16} {1:>5} {2:>9.1f} {3:>8.1f} {4:>8} {5:>9.1f} {6:>8} {7:>8} {8:>6}'.format(
+                name[:16], len(timings), total*1000, total*1000/len(timings),
+                '{0:.1f}'.format(sum(ttfbs)*1000/len(ttfbs)) if(ttfbs) else '-',
+                sum(t.sleep for t in timings)*1000,
+                sum(t.bytesOut for t in timings), sum(t.bytesIn for t in timings), sum(t.reads for t in timings),
+            ))
+
+        total = sum(t.latency for t in self.timings)
+        sleep = sum(t.sleep for t in self.timings)
+        device = total - sleep
+        lines.append('')
+        lines.append('Total {0:.1f} ms: device {1:.1f} ms ({2:.0f}%), delays {3:.1f} ms ({4:.0f}%)'.format(
+            total*1000, device*1000, device*100/total if(total) else 0, sleep*1000, sleep*100/total if(total) else 0
+        ))
+        return '\n'.join(lines)
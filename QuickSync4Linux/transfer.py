@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+
+# Adapts Obex transfers to the link: USB links take the full packet size back to back, lossy
+# links (Bluetooth, long UART cables) work better with smaller packets and a pause in between.
+# The controller measures the round trip time of every packet and grows the Put packet size
+# (and shrinks the pause) while the link is healthy; timeouts and broken packets halve the
+# packet size and add a pause. The packet size of a Get is chosen by the device, Gets are only
+# measured.
+
+import time
+
+from . import obex
+
+
+class TransferController:
+    GrowAfter  = 8     # packets without error before the packet size grows
+    GrowStep   = 8     # the packet size grows by 1/GrowStep of the maximum
+    PauseStep  = 0.010 # seconds of pause added by the first error
+    PauseMax   = 0.250
+    RttWeight  = 0.125 # weight of a new sample in the smoothed round trip time
+
+    def __init__(self, maxPacketSize, minPacketSize=obex.Connection.MinPacketSize, listener=None):
+        self.maxPacketSize = maxPacketSize
+        self.minPacketSize = min(minPacketSize, maxPacketSize)
+        self.packetSize = maxPacketSize
+        self.pause = 0.0
+        # called with the controller after every change of the statistics, e.g. for live output
+        self.listener = listener
+        self.rtt = None # smoothed seconds per packet
+        self.rttVariance = 0.0
+        self.lastRtt = None
+        self.healthy = 0 # packets since the last error or round trip time spike
+        self.packets = 0
+        self.failures = 0
+        self.bytes = 0
+        self.started = time.monotonic()
+
+    def setMaxPacketSize(self, maxPacketSize):
+        # a new Obex session, maybe with another negotiated size: keep what was learned about the link
+        self.maxPacketSize = maxPacketSize
+        self.minPacketSize = min(self.minPacketSize, maxPacketSize)
+        self.packetSize = min(self.packetSize, maxPacketSize)
+
+    def success(self, size, rtt):
+        self.packets += 1
+        self.bytes += size
+        self.lastRtt = rtt
+        if(self.rtt is None):
+            self.rtt = rtt
+            self.rttVariance = rtt / 2
+        else:
+            spike = rtt > self.rtt + 4 * self.rttVariance
+            self.rttVariance += self.RttWeight * (abs(rtt - self.rtt) - self.rttVariance)
+            self.rtt += self.RttWeight * (rtt - self.rtt)
+            if(spike):
+                # the device or link starts to struggle: do not grow any further for now
+                self.healthy = 0
+                self.notify()
+                return
+        self.healthy += 1
+        if(self.healthy % (self.GrowAfter // 2) == 0):
+            self.pause = self.pause / 2 if(self.pause >= self.PauseStep / 4) else 0.0
+        if(self.healthy % self.GrowAfter == 0):
+            self.packetSize = min(self.maxPacketSize, self.packetSize + self.maxPacketSize // self.GrowStep)
+        self.notify()
+
+    def failure(self, shrink=True):
+        # timeout, broken or lost packet: every error of a storm halves the packet size again;
+        # a busy device (shrink=False) only gets more time between the packets
+        self.failures += 1
+        self.healthy = 0
+        if(shrink): self.packetSize = max(self.minPacketSize, self.packetSize // 2)
+        self.pause = min(self.PauseMax, max(self.PauseStep, self.pause * 2))
+        self.notify()
+
+    def notify(self):
+        if(self.listener): self.listener(self)
+
+    def stats(self):
+        duration = time.monotonic() - self.started
+        return {
+            'packetSize': self.packetSize,
+            'pause': round(self.pause, 4),
+            'rtt': None if(self.rtt is None) else round(self.rtt, 4),
+            'lastRtt': None if(self.lastRtt is None) else round(self.lastRtt, 4),
+            'packets': self.packets,
+            'failures': self.failures,
+            'bytes': self.bytes,
+            'rate': self.bytes / duration if(duration) else 0,
+        }
+
+    def summary(self):
+        # short text for progress lines
+        text = '{0} B/packet'.format(self.packetSize)
+        if(self.rtt is not None): text += ', RTT {0:.0f} ms'.format(self.rtt * 1000)
+        if(self.pause): text += ', pause {0:.0f} ms'.format(self.pause * 1000)
+        if(self.failures): text += ', {0} errors'.format(self.failures)
+        return text
@@ -0,0 +1,25 @@
+#!/usr/bin/env python3
+
+import select
+
+class ReadTimeoutException(Exception):
+    pass
+
+def readAvailable(ser, timeout):
+    # block on the serial port until bytes arrive or the timeout expires,
+    # then return everything the driver has buffered (b'' on timeout)
+    try:
+        fd = ser.fileno()
+    except (AttributeError, ValueError, OSError):
+        fd = None
+
+    if(fd is not None):
+        ready, _, _ = select.select([fd], [], [], max(0, timeout))
+        if(not ready): return b''
+        return ser.read(max(1, ser.in_waiting))
+
+    # ports without a file descriptor: let pyserial block for the first byte
+    ser.timeout = max(0, timeout)
+    first = ser.read(1)
+    if(not first): return b''
+    return first + ser.read(ser.in_waiting)
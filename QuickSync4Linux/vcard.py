@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+
+import quopri
+import re
+
+
+# parameters of the vCard 3.0 dialect which the device (vCard 2.1) knows under another name
+encodingParams = {'B': 'BASE64', 'BASE64': 'BASE64', 'QUOTED-PRINTABLE': 'QUOTED-PRINTABLE', '8BIT': '8BIT'}
+
+# line length of quoted-printable values, longer lines are continued with a soft line break "="
+quotedPrintableLineLength = 76
+
+def splitVcards(text):
+    return re.findall(r"BEGIN\:VCARD[\S\s]*?END\:VCARD", text)
+
+def getLuid(vcard):
+    match = re.search(r"^X-IRMC-LUID:(\S+)", vcard, re.MULTILINE)
+    return match.group(1) if match else None
+
+def getProperties(vcard):
+    # list of (name, parameters, value), continued (folded) lines are joined, quoted-printable values decoded
+    properties = []
+    for line in unfoldLines(vcard.splitlines()):
+        name, separator, value = line.partition(":")
+        if(not separator): continue
+        params = [param.upper() for param in name.split(";")]
+        if("ENCODING=QUOTED-PRINTABLE" in params or "QUOTED-PRINTABLE" in params):
+            value = decodeQuotedPrintable(value, params)
+        properties.append((params[0], params[1:], value.strip()))
+    return properties
+
+def getName(properties):
+    # formatted name, or "given family" from the structured name
+    for name, params, value in properties:
+        if(name == "FN" and value): return value
+    for name, params, value in properties:
+        if(name == "N"): return " ".join(part for part in reversed(value.split(";")) if part).strip()
+    return ""
+
+
+### streaming import
+
+def isQuotedPrintable(line):
+    return "QUOTED-PRINTABLE" in line.partition(":")[0].upper()
+
+def decodeQuotedPrintable(value, params):
+    charset = next((param.split("=", 1)[1] for param in params if param.startswith("CHARSET=")), "UTF-8")
+    try:
+        return quopri.decodestring(value.encode("ascii", errors="replace")).decode(charset, errors="replace")
+    except LookupError:
+        return quopri.decodestring(value.encode("ascii", errors="replace")).decode("utf8", errors="replace")
+
+def unfoldLines(lines):
+    # logical lines from physical lines (with or without line break): a line starting with a space
+    # or tab continues the previous one (folding), as does the line after a quoted-printable line
+    # ending with "=" (soft line break)
+    current = None
+    for line in lines:
+        line = line.rstrip("\r\n")
+        if(current is not None and current.endswith("=") and isQuotedPrintable(current)):
+            current = current[:-1] + line
+        elif(current is not None and line[:1] in (" ", "\t")):
+            current += line[1:]
+        else:
+            if(current is not None): yield current
+            current = line
+    if(current is not None): yield current
+
+def readVcards(lines):
+    # lazily yields the properties (logical lines) of one vCard after the other, e.g. from a file
+    # opened in text mode, which is read line by line; text outside of BEGIN/END is skipped
+    card = None
+    for line in unfoldLines(lines):
+        keyword = line.strip().upper()
+        if(keyword == "BEGIN:VCARD"):
+            card = []
+        elif(card is None):
+            continue
+        elif(keyword == "END:VCARD"):
+            yield card
+            card = None
+        else:
+            card.append(line)
+
+def encodeQuotedPrintable(value):
+    encoded = ""
+    for byte in value.encode("utf8"):
+        if(33 <= byte <= 126 and byte != ord("=")): encoded += chr(byte)
+        elif(byte == ord(" ")): encoded += " "
+        else: encoded += "={0:02X}".format(byte)
+    if(encoded.endswith(" ")): encoded = encoded[:-1] + "=20"
+    return encoded
+
+def foldQuotedPrintable(line):
+    # soft line breaks, never inside an "=XX" escape
+    parts = []
+    while(len(line) > quotedPrintableLineLength):
+        cut = quotedPrintableLineLength - 1
+        escape = line.rfind("=", cut-2, cut)
+        if(escape != -1): cut = escape
+        parts.append(line[:cut] + "=")
+        line = line[cut:]
+    return parts + [line]
+
+def convertParams(params, version):
+    # vCard 3.0 "TYPE=HOME,CELL" and "ENCODING=b" to the 2.1 style "HOME;CELL" and "ENCODING=BASE64"
+    converted = []
+    for param in params:
+        key, separator, value = param.partition("=")
+        if(key.upper() == "TYPE" and separator):
+            converted += [item.upper() for item in value.split(",") if item]
+        elif(key.upper() == "ENCODING" and separator):
+            converted.append("ENCODING=" + encodingParams.get(value.upper(), value.upper()))
+        elif(version != "2.1" and not separator):
+            converted.append(param.upper())
+        else:
+            converted.append(param)
+    return converted
+
+def encodeVcard(properties):
+    # one vCard in the 2.1 dialect of the device as ASCII bytes with CRLF line breaks:
+    # values with other characters (or line breaks) are sent quoted-printable in UTF-8
+    version = next((line.partition(":")[2].strip() for line in properties if line.upper().startswith("VERSION:")), "2.1")
+    lines = ["BEGIN:VCARD", "VERSION:2.1"]
+    for line in properties:
+        name, separator, value = line.partition(":")
+        if(not separator): continue
+        params = name.split(";")
+        if(params[0].upper() == "VERSION"): continue
+        params = [params[0]] + convertParams(params[1:], version)
+        if(version != "2.1" and not isQuotedPrintable(name)):
+            # escaped line breaks and commas of vCard 3.0, the semicolon stays escaped in 2.1
+            value = re.sub(r"\\([nN,\\])", lambda match: {"n": "\n", "N": "\n"}.get(match.group(1), match.group(1)), value)
+        if(not isQuotedPrintable(name) and (not value.isascii() or "\n" in value or "\r" in value)):
+            value = encodeQuotedPrintable(value.replace("\r\n", "\n").replace("\n", "\r\n"))
+            params.append("ENCODING=QUOTED-PRINTABLE")
+            if(not any(param.upper().startswith("CHARSET=") for param in params)): params.append("CHARSET=UTF-8")
+        line = ";".join(params) + ":" + value
+        lines += foldQuotedPrintable(line) if(isQuotedPrintable(line)) else [line]
+    lines.append("END:VCARD")
+    return "\r\n".join(lines).encode("ascii")
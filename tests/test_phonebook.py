@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+
+# Unit tests for the caller ID matching of the reverse lookup index, no device or simulator needed
+
+import unittest
+
+from QuickSync4Linux import phonebook
+
+
+# AT^SACO? of a handset in Berlin: international prefix, country code, national prefix, area code
+berlin = ['00', '49', '0', '30']
+
+def vcard(luid, name, *numbers):
+    lines = ['BEGIN:VCARD', 'VERSION:2.1', 'N:'+name]
+    lines += ['TEL;{0}:{1}'.format(kind, number) for kind, number in numbers]
+    lines += ['X-IRMC-LUID:{0}'.format(luid), 'END:VCARD']
+    return '\r\n'.join(lines)
+
+
+class NormalizeNumberTest(unittest.TestCase):
+    def testNationalNotations(self):
+        for number in ['+49 (0)30 1234567', '+49 30 1234567', '0049 30 1234567', '030 1234567', '030/123 45-67']:
+            with self.subTest(number=number):
+                self.assertEqual(phonebook.normalizeNumber(number, berlin), '301234567')
+
+    def testLocalNumber(self):
+        self.assertEqual(phonebook.normalizeNumber('1234567', berlin), '301234567')
+        self.assertEqual(phonebook.normalizeNumber('123 45 67', berlin), '301234567')
+
+    def testOtherCountry(self):
+        for number in ['+33 1 23 45 67 89', '0033 1 23 45 67 89', '+33 (0)1 23 45 67 89']:
+            with self.subTest(number=number):
+                self.assertEqual(phonebook.normalizeNumber(number, berlin), '+33123456789')
+
+    def testDefaultAreaCodes(self):
+        # without an AT^SACO? answer the country and the local area are unknown
+        self.assertEqual(phonebook.normalizeNumber('+49 30 1234567'), '+49301234567')
+        self.assertEqual(phonebook.normalizeNumber('0049 30 1234567'), '+49301234567')
+        self.assertEqual(phonebook.normalizeNumber('030 1234567'), '301234567')
+        self.assertEqual(phonebook.normalizeNumber('1234567'), '1234567')
+
+    def testNoDigits(self):
+        self.assertEqual(phonebook.normalizeNumber('-', berlin), '')
+
+    def testParseAreaCodes(self):
+        self.assertEqual(phonebook.parseAreaCodes('^SACO: 00,49,0,30'), berlin)
+        self.assertEqual(phonebook.parseAreaCodes('^SACO: "00","49","0",""'), ['00', '49', '0', ''])
+        with self.assertRaises(ValueError):
+            phonebook.parseAreaCodes('^SACO: 00,49')
+
+
+class LookupTest(unittest.TestCase):
+    def setUp(self):
+        self.index = phonebook.PhoneBookIndex('0123456789ABCDEF')
+        self.index.rebuild([
+            vcard(1, 'Doe;John', ('HOME', '+49 30 1234567')),
+            vcard(2, 'Mustermann;Erika', ('CELL', '0171 7654321'), ('WORK', '030 7654321')),
+            vcard(3, 'Dupont;Marie', ('HOME', '+33 1 23 45 67 89')),
+        ], berlin)
+
+    def names(self, results):
+        return sorted(result['name'] for result in results)
+
+    def testLookupInAnyNotation(self):
+        for number in ['+4930 1234567', '004930 1234567', '0301234567', '1234567']:
+            with self.subTest(number=number):
+                results = self.index.lookup(number)
+                self.assertEqual(self.names(results), ['John Doe'])
+                self.assertEqual((results[0]['luid'], results[0]['type'], results[0]['number']), ('1', 'HOME', '+49 30 1234567'))
+        self.assertEqual(self.names(self.index.lookup('0033 123456789')), ['Marie Dupont'])
+        self.assertEqual(self.index.lookup('0301234568'), [])
+
+    def testPrefixLookup(self):
+        self.assertEqual(self.names(phonebook.lookup('030*', [self.index])), ['Erika Mustermann', 'John Doe'])
+        self.assertEqual(self.names(phonebook.lookup('+4930 765*', [self.index])), ['Erika Mustermann'])
+        self.assertEqual(self.names(phonebook.lookup('0171*', [self.index])), ['Erika Mustermann'])
+        self.assertEqual(len(self.index.lookupPrefix('030', limit=1)), 1)
+
+    def testIndexSink(self):
+        # the downloaded phonebook arrives in arbitrary chunks, a repeated download resets the index
+        data = '\r\n'.join([vcard(4, 'Müller;Jürgen', ('CELL', '0170 111')), vcard(5, 'Plain;Ascii', ('WORK', '222'))]).encode('utf8')
+        index = phonebook.PhoneBookIndex('0123456789ABCDEF')
+        sink = phonebook.IndexSink(index, berlin)
+        sink.write(data[:50])
+        sink.reset()
+        for position in range(0, len(data), 7): sink.write(data[position:position+7])
+        self.assertEqual(sorted(index.contacts), ['4', '5'])
+        self.assertEqual(self.names(index.lookup('+49170111')), ['Jürgen Müller'])
+        self.assertEqual(self.names(index.lookup('030 222')), ['Ascii Plain'])
+
+    def testContactsWithoutLuid(self):
+        self.index.rebuild([vcard(1, 'Doe;John', ('HOME', '1234567')).replace('X-IRMC-LUID:1\r\n', '')], berlin)
+        results = self.index.lookup('+49301234567')
+        self.assertEqual(self.names(results), ['John Doe'])
+        self.assertIsNone(results[0]['luid'])
+
+
+if __name__ == '__main__':
+    unittest.main()
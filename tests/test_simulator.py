@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+
+# Regression tests against the device simulator, no hardware needed:
+#   python3 -m pytest tests
+# or without pytest:
+#   python3 -m unittest discover tests
+
+from contextlib import redirect_stdout, redirect_stderr
+from argparse import Namespace
+from unittest import mock
+import configparser
+import asyncio
+import threading
+import unittest
+import tempfile
+import shutil
+import random
+import time
+import io
+import os
+
+from QuickSync4Linux import simulator
+from QuickSync4Linux import quicksync
+from QuickSync4Linux import client
+from QuickSync4Linux import daemon
+from QuickSync4Linux import obex
+from QuickSync4Linux import at
+
+
+# the simulator does not need the settle times of a real device
+fastDelays = {'AfterInvoke': 0, 'AfterEnterObex': 0.05, 'AfterExitObex': 0.05, 'ObexBoundary': 0.05, 'RetryBackoff': 0.01}
+
+class SimulatorTestCase(unittest.TestCase):
+    simulatorOptions = {}
+
+    def setUp(self):
+        # separate config, cache and data directories, so that the tests never touch the real ones
+        self.tempDir = tempfile.mkdtemp()
+        environ = mock.patch.dict(os.environ, {
+            'HOME': self.tempDir,
+            'XDG_CACHE_HOME': os.path.join(self.tempDir, 'cache'),
+            'XDG_DATA_HOME': os.path.join(self.tempDir, 'data'),
+            'XDG_RUNTIME_DIR': self.tempDir,
+        })
+        environ.start()
+        self.addCleanup(environ.stop)
+        for name, value in fastDelays.items():
+            delay = mock.patch.object(at.Delay, name, value)
+            delay.start()
+            self.addCleanup(delay.stop)
+        self.sim = simulator.Simulator(**dict({'seed': 1}, **self.simulatorOptions)).start()
+        self.addCleanup(self.sim.stop)
+        self.addCleanup(shutil.rmtree, self.tempDir, True)
+
+    def path(self, name):
+        return os.path.join(self.tempDir, name)
+
+    def quicksync(self, *args, useDaemon=False):
+        # runs the command line tool, returns exit code and stdout
+        stdout = io.StringIO()
+        argv = ['quicksync'] + list(args) + ['--device', self.sim.port] + ([] if(useDaemon) else ['--no-daemon'])
+        with mock.patch('sys.argv', argv), redirect_stdout(stdout), redirect_stderr(io.StringIO()):
+            try:
+                quicksync.main()
+                code = 0
+            except SystemExit as e:
+                code = e.code or 0
+        return code, stdout.getvalue()
+
+    def openClient(self, srm=True):
+        quickSyncClient = client.QuickSyncClient(self.sim.port).open()
+        quickSyncClient.singleResponseMode = srm
+        self.addCleanup(quickSyncClient.close)
+        return quickSyncClient
+
+
+class ActionTest(SimulatorTestCase):
+    def testInfo(self):
+        code, output = self.quicksync('info')
+        self.assertEqual(code, 0)
+        self.assertIn('S700H PRO', output)
+        self.assertIn('0123456789ABCDEF', output)
+
+    def testInfoCacheFollowsFirmware(self):
+        self.assertIn('^LOSF: (1,2,3,4)', self.quicksync('info')[1])
+        atResponses = self.sim.atResponses
+        def updated():
+            return dict(atResponses(), **{at.Command.GetFirmwareVersion: '42.099', at.Command.GetSupportedFeatures: '^LOSF: (1,2,3,4,5)'})
+        with mock.patch.object(self.sim, 'atResponses', updated):
+            output = self.quicksync('info')[1]
+        self.assertIn('Firmware: 42.099', output)
+        self.assertIn('^LOSF: (1,2,3,4,5)', output)
+
+    def testListFiles(self):
+        code, output = self.quicksync('listfiles')
+        self.assertEqual(code, 0)
+        self.assertIn('Gigaset.jpg', output)
+        self.assertIn('Classic.L22', output)
+
+    def testUploadDownload(self):
+        data = bytes(random.Random(1).getrandbits(8) for i in range(5000))
+        with open(self.path('upload.bin'), 'wb') as f: f.write(data)
+        self.assertEqual(self.quicksync('upload', '/Sounds/test.bin', '--file', self.path('upload.bin'))[0], 0)
+        self.assertEqual(self.sim.files[obex.FolderPath.Ringtones]['test.bin'].data, data)
+        self.assertEqual(self.quicksync('download', '/Sounds/test.bin', '--file', self.path('download.bin'))[0], 0)
+        with open(self.path('download.bin'), 'rb') as f: self.assertEqual(f.read(), data)
+
+    def testPictureUploadModes(self):
+        with open(self.path('small.jpg'), 'wb') as f: f.write(b'\xff\xd8' + bytes(2000) + b'\xff\xd9')
+        with mock.patch.object(client.QuickSyncClient, 'putImage', wraps=None) as putImage:
+            self.assertEqual(self.quicksync('upload', '/Clip Pictures/obex.jpg', '--file', self.path('small.jpg'))[0], 0)
+            putImage.assert_not_called() # AT upload only on request
+        self.assertEqual(self.quicksync('upload', '/Clip Pictures/at.jpg', '--file', self.path('small.jpg'), '--at-upload')[0], 0)
+        self.assertEqual(set(self.sim.files[obex.FolderPath.ClipPictures]), {'obex.jpg', 'at.jpg'})
+
+    def testPictureUploadFallbackAfterLateAnswers(self):
+        image = b'\xff\xd8' + bytes(range(256)) * 12 + b'\xff\xd9'
+        with open(self.path('small.jpg'), 'wb') as f: f.write(image)
+        # the first part is rejected while the answers of the other parts of the batch are still on their way
+        receiveImagePart = self.sim.receiveImagePart
+        calls = []
+        def rejectFirst(arguments):
+            calls.append(arguments)
+            return None if(len(calls) == 1) else receiveImagePart(arguments)
+        with mock.patch.object(self.sim, 'receiveImagePart', rejectFirst), mock.patch.object(self.sim, 'responseDelay', 0.05):
+            self.assertEqual(self.quicksync('upload', '/Clip Pictures/late.jpg', '--file', self.path('small.jpg'), '--at-upload', '--retries', '0')[0], 0)
+        self.assertGreater(len(calls), 1)
+        self.assertEqual(self.sim.files[obex.FolderPath.ClipPictures]['late.jpg'].data, image)
+
+    def testFailedDownloadKeepsFile(self):
+        with open(self.path('keep.jpg'), 'wb') as f: f.write(b'data')
+        with self.assertRaises(obex.ObexException):
+            self.quicksync('download', '/Pictures/Nope.jpg', '--file', self.path('keep.jpg'))
+        with open(self.path('keep.jpg'), 'rb') as f: self.assertEqual(f.read(), b'data')
+
+    def testGetContactsRetriesLostPacket(self):
+        for i in range(100): self.sim.storeContact(None, 'BEGIN:VCARD\r\nVERSION:2.1\r\nN:Test;{0}\r\nTEL;CELL:+4930{0:04}\r\nEND:VCARD'.format(i))
+        # the answer to one continuation request gets lost, the download starts over
+        handleGet = self.sim.handleGet
+        gets = []
+        def lost(packet):
+            gets.append(packet)
+            response = handleGet(packet)
+            return b'' if(len(gets) == 3) else response
+        with mock.patch.object(self.sim, 'handleGet', lost), mock.patch.object(at.Delay, 'TimeoutRead', 0.5):
+            self.assertEqual(self.quicksync('getcontacts', '--no-srm', '--file', self.path('contacts.vcf'))[0], 0)
+        with open(self.path('contacts.vcf'), 'rb') as f: self.assertEqual(f.read(), self.sim.phoneBook())
+        code, output = self.quicksync('lookup', '030 0099')
+        self.assertEqual(code, 0)
+        self.assertEqual(output.count('Test'), 1)
+
+    def testCreateContacts(self):
+        with open(self.path('contacts.vcf'), 'w') as f:
+            f.write('BEGIN:VCARD\nVERSION:3.0\nN:Müller;Jürgen\nTEL;TYPE=CELL:+49301234\nEND:VCARD\n')
+            f.write('BEGIN:VCARD\nVERSION:2.1\nN:Plain;Ascii\nTEL;WORK:0301234\nEND:VCARD\n')
+        contacts = len(self.sim.contacts)
+        self.assertEqual(self.quicksync('createcontacts', '--file', self.path('contacts.vcf'))[0], 0)
+        self.assertEqual(len(self.sim.contacts), contacts + 2)
+        phoneBook = self.sim.phoneBook().decode('utf8')
+        self.assertIn('N;ENCODING=QUOTED-PRINTABLE;CHARSET=UTF-8:M=C3=BCller;J=C3=BCrgen', phoneBook)
+        self.assertIn('TEL;CELL:+49301234', phoneBook)
+
+    def testCreateContactsResumesAfterInterrupt(self):
+        with open(self.path('contacts.vcf'), 'w') as f:
+            for i in range(5): f.write('BEGIN:VCARD\nVERSION:2.1\nN:Test;{0}\nEND:VCARD\n'.format(i))
+        contacts = len(self.sim.contacts)
+        createContact = client.QuickSyncClient.createContact
+        calls = []
+        def interrupted(quickSyncClient, vcard):
+            calls.append(vcard)
+            if(len(calls) == 3): raise KeyboardInterrupt()
+            return createContact(quickSyncClient, vcard)
+        with mock.patch.object(client.QuickSyncClient, 'createContact', interrupted):
+            with self.assertRaises(KeyboardInterrupt):
+                self.quicksync('createcontacts', '--file', self.path('contacts.vcf'))
+        self.assertEqual(len(self.sim.contacts), contacts + 2)
+        self.assertEqual(self.quicksync('createcontacts', '--file', self.path('contacts.vcf'))[0], 0)
+        self.assertEqual(len(self.sim.contacts), contacts + 5)
+
+    def testSyncContacts(self):
+        self.assertEqual(self.quicksync('synccontacts', '--file', self.path('sync.vcf'))[0], 0)
+        with open(self.path('sync.vcf')) as f: self.assertIn('Mustermann', f.read())
+
+        # incremental: one contact changed, one deleted on the device
+        self.sim.storeContact(1, 'BEGIN:VCARD\r\nVERSION:2.1\r\nN:Doe;Jane\r\nTEL;HOME:+49123456789\r\nEND:VCARD')
+        self.sim.deleteContact(2)
+        self.assertEqual(self.quicksync('synccontacts', '--file', self.path('sync.vcf'))[0], 0)
+        with open(self.path('sync.vcf')) as f: vcf = f.read()
+        self.assertIn('N:Doe;Jane', vcf)
+        self.assertNotIn('Mustermann', vcf)
+
+    def testMirrorDeletesOnlyInLocalFolders(self):
+        os.makedirs(self.path('media/Sounds'))
+        with open(self.path('media/Sounds/new.bin'), 'wb') as f: f.write(b'sound')
+        self.assertEqual(self.quicksync('mirror', 'delete', '--file', self.path('media'))[0], 0)
+        self.assertEqual(set(self.sim.files[obex.FolderPath.Ringtones]), {'new.bin'})
+        self.assertIn('Gigaset.jpg', self.sim.files[obex.FolderPath.ScreenSavers])
+
+    def testMirrorIgnoresHandsetClock(self):
+        os.makedirs(self.path('media/Sounds'))
+        sound = self.path('media/Sounds/new.bin')
+        with open(sound, 'wb') as f: f.write(b'sound')
+        # the local clock is an hour ahead of the handset
+        os.utime(sound, (time.time() + 3600, time.time() + 3600))
+        self.assertEqual(self.quicksync('mirror', '--file', self.path('media'))[0], 0)
+        putFile = client.QuickSyncClient.putFile
+        with mock.patch.object(client.QuickSyncClient, 'putFile', autospec=True, side_effect=putFile) as upload:
+            self.assertEqual(self.quicksync('mirror', '--file', self.path('media'))[0], 0)
+            upload.assert_not_called()
+            with open(sound, 'wb') as f: f.write(b'SOUND')
+            self.assertEqual(self.quicksync('mirror', '--file', self.path('media'))[0], 0)
+            upload.assert_called_once()
+        self.assertEqual(self.sim.files[obex.FolderPath.Ringtones]['new.bin'].data, b'SOUND')
+
+    def testSyncContactsKeepsContactOnError(self):
+        self.assertEqual(self.quicksync('synccontacts', '--file', self.path('sync.vcf'))[0], 0)
+        self.sim.storeContact(1, 'BEGIN:VCARD\r\nVERSION:2.1\r\nN:Doe;Jane\r\nTEL;HOME:+49123456789\r\nEND:VCARD')
+        # the changed contact can not be read: the sync fails instead of dropping the contact
+        handleGet = self.sim.handleGet
+        def forbidden(packet):
+            if('luid/1.vcf'.encode('utf-16-be') in bytes(packet)): return self.sim.response(obex.ReCode.Forbidden)
+            return handleGet(packet)
+        with mock.patch.object(self.sim, 'handleGet', forbidden):
+            with self.assertRaises(obex.ObexException):
+                self.quicksync('synccontacts', '--retries', '0', '--file', self.path('sync.vcf'))
+        self.assertEqual(self.quicksync('synccontacts', '--file', self.path('sync.vcf'))[0], 0)
+        with open(self.path('sync.vcf')) as f: self.assertIn('N:Doe;Jane', f.read())
+
+
+class DaemonTest(SimulatorTestCase):
+    def setUp(self):
+        super().setUp()
+        self.daemon = daemon.QuickSyncDaemon(self.sim.port, 9600, configparser.ConfigParser(), self.path('quicksync4linux.ini'))
+        server = self.daemon.createServer(daemon.defaultSocketPath())
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(self.daemon.resetClient)
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+
+    def testForwardedOptions(self):
+        code, output = self.quicksync('info', '-v', '--retries', '0', '--baud', '19200', useDaemon=True)
+        self.assertEqual(code, 0)
+        self.assertIn('AT+CGMI', output) # verbose output of the daemon client
+        # the options of one call do not stick to the daemon
+        self.assertEqual((self.daemon.client.verbose, self.daemon.client.retries, self.daemon.client.ser.baudrate), (0, 3, 9600))
+        code, output = self.quicksync('info', useDaemon=True)
+        self.assertNotIn('AT+CGMI', output)
+
+        with open(self.path('small.jpg'), 'wb') as f: f.write(b'\xff\xd8' + bytes(2000) + b'\xff\xd9')
+        putImage = client.QuickSyncClient.putImage
+        with mock.patch.object(client.QuickSyncClient, 'putImage', autospec=True, side_effect=putImage) as atUpload:
+            self.assertEqual(self.quicksync('upload', '/Clip Pictures/at.jpg', '--file', self.path('small.jpg'), '--at-upload', useDaemon=True)[0], 0)
+            atUpload.assert_called_once()
+        self.assertIn('at.jpg', self.sim.files[obex.FolderPath.ClipPictures])
+
+    def testSocketOfAnotherUser(self):
+        self.assertEqual(os.stat(daemon.defaultSocketPath()).st_mode & 0o777, 0o600)
+        with mock.patch.object(self.daemon, 'execute') as execute, mock.patch.object(daemon.os, 'getuid', return_value=os.getuid()+1):
+            with self.assertRaises(ConnectionRefusedError):
+                daemon.forward(daemon.defaultSocketPath(), Namespace(
+                    action='info', options=None, file='-', device=self.sim.port, baud=None, verbose=0, retries=3, no_srm=False, no_adaptive=False, at_upload=False
+                ))
+            execute.assert_not_called()
+
+    def testRequestSettings(self):
+        settings = []
+        def runAction(quickSyncClient, args, configParser, configPath):
+            settings.append((quickSyncClient.retries, quickSyncClient.singleResponseMode, quickSyncClient.adaptiveTransfer, args.at_upload))
+            return 0
+        with mock.patch.object(quicksync, 'runAction', runAction):
+            response = self.daemon.execute({'action': 'info', 'retries': 0, 'srm': False, 'adaptive': False, 'atUpload': True})
+        self.assertEqual(response['returncode'], 0)
+        self.assertEqual(settings, [(0, False, False, True)])
+        self.assertEqual((self.daemon.client.retries, self.daemon.client.singleResponseMode, self.daemon.client.adaptiveTransfer), (3, True, True))
+
+
+class TransferTest(SimulatorTestCase):
+    simulatorOptions = {'baud': 115200}
+
+    def roundTrip(self, srm, size=20000):
+        data = bytes(random.Random(size).getrandbits(8) for i in range(size))
+        quickSyncClient = self.openClient(srm)
+        with quickSyncClient.obexSession():
+            quickSyncClient.putFile('/Sounds/test.bin', io.BytesIO(data), len(data))
+            self.assertEqual(self.sim.files[obex.FolderPath.Ringtones]['test.bin'].data, data)
+            self.assertEqual(quickSyncClient.getObject('/Sounds/test.bin'), data)
+        return quickSyncClient
+
+    def testRoundTripWithoutSrm(self):
+        self.assertIsNot(self.roundTrip(srm=False).srm, True)
+
+    def testAsyncRoundTrip(self):
+        data = bytes(random.Random(3).getrandbits(8) for i in range(20000))
+        async def roundTrip():
+            async with client.AsyncQuickSyncClient(self.sim.port, 115200) as asyncClient:
+                asyncClient.singleResponseMode = False # every Get packet needs a continuation request
+                # requests are written on the event loop, never with the blocking pyserial write
+                asyncClient.ser.write = mock.Mock(side_effect=AssertionError('blocking write'))
+                async with asyncClient.obexSession():
+                    await asyncClient.putFile('/Sounds/async.bin', io.BytesIO(data), len(data))
+                    return await asyncClient.getObject('/Sounds/async.bin')
+        self.assertEqual(asyncio.run(roundTrip()), data)
+        self.assertEqual(self.sim.files[obex.FolderPath.Ringtones]['async.bin'].data, data)
+
+class SrmTransferTest(TransferTest):
+    simulatorOptions = {'baud': 115200, 'srm': 'on'}
+
+    def testRoundTripWithSrm(self):
+        self.assertTrue(self.roundTrip(srm=True).srm)
+
+
+class SrmBusyTest(SimulatorTestCase):
+    # an error answer for a streamed packet arrives late and must not be taken for the answer of
+    # a later packet, otherwise only the last packet is repeated and the file is stored incomplete
+    def testUploadWithBusyDevice(self):
+        data = bytes(random.Random(7).getrandbits(8) for i in range(50000))
+        for seed in [0, 1]:
+            with self.subTest(seed=seed):
+                sim = simulator.Simulator(srm='on', baud=115200, errors=('busy',), errorRate=0.03, seed=seed).start()
+                self.addCleanup(sim.stop)
+                quickSyncClient = client.QuickSyncClient(sim.port).open()
+                self.addCleanup(quickSyncClient.close)
+                with quickSyncClient.obexSession():
+                    quickSyncClient.putFile('/Sounds/test.bin', io.BytesIO(data), len(data))
+                self.assertEqual(sim.files[obex.FolderPath.Ringtones]['test.bin'].data, data)
+
+
+if __name__ == '__main__':
+    unittest.main()